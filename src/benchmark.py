@@ -0,0 +1,412 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+import httpx
+import numpy as np
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("Benchmark")
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Режим симуляции -> скорость; в режиме fast-forward параллельно нагрузке
+# симуляция прокручивается запросами /api/simulation/fast_forward
+MODES = {"1x": 1.0, "60x": 60.0, "fast-forward": 1.0}
+ENDPOINTS = ("state", "device", "time", "reports")
+DEFAULT_MIX = "state=60,device=15,time=15,reports=10"
+FAST_FORWARD_DAYS = 0.25
+
+# Исполнительные устройства, которые нагрузка переключает: тип -> (поле, максимум)
+DEVICE_FIELDS = {
+    "light": ("brightness", 100),
+    "curtain": ("open_percent", 100),
+    "window": ("open_percent", 100),
+}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Разбирает смесь запросов вида "state=60,device=15" в веса эндпоинтов"""
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in mix: {name}")
+        weights[name] = float(weight)
+    return weights
+
+
+def latency_summary(latencies: List[float]) -> Dict:
+    """Перцентили задержки в миллисекундах"""
+    if not latencies:
+        return {"count": 0}
+    values = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": len(values),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(values.max()),
+    }
+
+
+class _Server:
+    """Экземпляр main:app на локальном порту: отдельный процесс uvicorn или
+    поток в текущем процессе"""
+
+    def __init__(self, workdir: str, in_process: bool = False):
+        self.workdir = workdir
+        self.in_process = in_process
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._process: Optional[subprocess.Popen] = None
+        self._log = None
+        self._server = None
+
+    def start(self):
+        src_dir = os.path.dirname(os.path.abspath(__file__))
+        if self.in_process:
+            import uvicorn
+
+            os.chdir(self.workdir)
+            sys.path.insert(0, src_dir)
+            config = uvicorn.Config(
+                "main:app", host="127.0.0.1", port=self.port, log_level="warning"
+            )
+            self._server = uvicorn.Server(config)
+            threading.Thread(target=self._server.run, daemon=True).start()
+        else:
+            env = {**os.environ, "PYTHONPATH": src_dir}
+            # Журнал сервера пишется в рабочий каталог, чтобы не мешать сводке
+            self._log = open(os.path.join(self.workdir, "server.log"), "w")
+            self._process = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "uvicorn",
+                    "main:app",
+                    "--host",
+                    "127.0.0.1",
+                    "--port",
+                    str(self.port),
+                    "--log-level",
+                    "warning",
+                ],
+                cwd=self.workdir,
+                env=env,
+                stdout=self._log,
+                stderr=subprocess.STDOUT,
+            )
+
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            try:
+                httpx.get(f"{self.url}/", timeout=1).raise_for_status()
+                logger.info(f"Server started at {self.url} (workdir {self.workdir})")
+                return
+            except httpx.HTTPError:
+                if self._process is not None and self._process.poll() is not None:
+                    break
+                time.sleep(0.2)
+        raise RuntimeError("Server did not start")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._process is not None:
+            self._process.terminate()
+            self._process.wait(timeout=30)
+            self._log.close()
+
+
+class LoadRun:
+    """Один прогон нагрузки: concurrency клиентов в течение duration секунд
+    шлют запросы в заданной смеси, задержки копятся по эндпоинтам"""
+
+    def __init__(
+        self,
+        url: str,
+        weights: Dict[str, float],
+        devices: List[Dict],
+        concurrency: int,
+        seed: int = 0,
+    ):
+        self.url = url
+        self.names = list(weights)
+        self.weights = list(weights.values())
+        self.devices = devices
+        self.concurrency = concurrency
+        self.random = random.Random(seed)
+        self.latencies: Dict[str, List[float]] = {name: [] for name in self.names}
+        self.errors: Dict[str, int] = {name: 0 for name in self.names}
+        self.recording = False
+
+    async def _request(self, client: httpx.AsyncClient, name: str) -> httpx.Response:
+        if name == "state":
+            return await client.get("/api/state")
+        if name == "time":
+            return await client.get("/api/time")
+        if name == "reports":
+            return await client.get("/api/reports")
+        device = self.random.choice(self.devices)
+        field, maximum = DEVICE_FIELDS[device["type"]]
+        return await client.post(
+            "/api/device",
+            json={
+                "room": device["room"],
+                "device_id": device["id"],
+                "status": {field: self.random.randint(0, maximum)},
+            },
+        )
+
+    async def _worker(self, client: httpx.AsyncClient, deadline: float):
+        while time.perf_counter() < deadline:
+            name = self.random.choices(self.names, self.weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await self._request(client, name)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            if not self.recording:
+                continue
+            self.latencies[name].append(time.perf_counter() - started)
+            if failed:
+                self.errors[name] += 1
+
+    async def run(self, warmup: float, duration: float) -> float:
+        """Прогревает сервер warmup секунд, затем измеряет duration секунд.
+        Возвращает фактическую длительность измерения"""
+        limits = httpx.Limits(max_connections=self.concurrency)
+        async with httpx.AsyncClient(
+            base_url=self.url, limits=limits, timeout=60
+        ) as client:
+            if warmup > 0:
+                deadline = time.perf_counter() + warmup
+                await asyncio.gather(
+                    *(self._worker(client, deadline) for _ in range(self.concurrency))
+                )
+            self.recording = True
+            started = time.perf_counter()
+            deadline = started + duration
+            await asyncio.gather(
+                *(self._worker(client, deadline) for _ in range(self.concurrency))
+            )
+            return time.perf_counter() - started
+
+
+async def _fast_forward_loop(url: str, stop: asyncio.Event) -> Dict:
+    """Прокручивает симуляцию порциями по FAST_FORWARD_DAYS, пока не остановят"""
+    days = 0.0
+    elapsed = 0.0
+    async with httpx.AsyncClient(base_url=url, timeout=600) as client:
+        while not stop.is_set():
+            response = await client.post(
+                "/api/simulation/fast_forward", json={"days": FAST_FORWARD_DAYS}
+            )
+            response.raise_for_status()
+            days += FAST_FORWARD_DAYS
+            elapsed += response.json()["elapsed_seconds"]
+    return {"days": days, "elapsed_seconds": elapsed}
+
+
+async def _simulated_minutes(client: httpx.AsyncClient) -> float:
+    """Время симуляции в минутах с её начала"""
+    data = (await client.get("/api/state")).json()
+    return data["days_passed"] * 1440 + data["time_minutes"]
+
+
+async def run_scenario(
+    url: str,
+    mode: str,
+    concurrency: int,
+    weights: Dict[str, float],
+    warmup: float,
+    duration: float,
+    seed: int,
+) -> Dict:
+    """Прогон нагрузки в одном режиме симуляции с одной конкурентностью"""
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        response = await client.post(
+            "/api/simulation/speed", json={"speed": MODES[mode]}
+        )
+        response.raise_for_status()
+        state = (await client.get("/api/state")).json()
+        devices = [
+            {"room": room_name, "id": device_id, "type": device["type"]}
+            for room_name, room in state["rooms"].items()
+            for device_id, device in room["devices"].items()
+            if device["type"] in DEVICE_FIELDS
+        ]
+        start_minutes = state["days_passed"] * 1440 + state["time_minutes"]
+
+    stop = asyncio.Event()
+    fast_forward = None
+    if mode == "fast-forward":
+        fast_forward = asyncio.create_task(_fast_forward_loop(url, stop))
+
+    load = LoadRun(url, weights, devices, concurrency, seed)
+    measured = await load.run(warmup, duration)
+
+    fast_forward_result = None
+    if fast_forward is not None:
+        stop.set()
+        fast_forward_result = await fast_forward
+
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        simulated = await _simulated_minutes(client) - start_minutes
+
+    all_latencies = [value for values in load.latencies.values() for value in values]
+    result = {
+        "mode": mode,
+        "concurrency": concurrency,
+        "duration_seconds": measured,
+        "requests": len(all_latencies),
+        "errors": sum(load.errors.values()),
+        "throughput_rps": len(all_latencies) / measured,
+        "simulated_minutes": simulated,
+        "latency": latency_summary(all_latencies),
+        "endpoints": {
+            name: {**latency_summary(values), "errors": load.errors[name]}
+            for name, values in load.latencies.items()
+        },
+    }
+    if fast_forward_result is not None:
+        result["fast_forward"] = fast_forward_result
+
+    latency = result["latency"]
+    logger.info(
+        f"{mode:>12} c={concurrency:<4} {result['throughput_rps']:8.1f} req/s  "
+        f"p50 {latency.get('p50_ms', 0):7.2f} ms  p95 {latency.get('p95_ms', 0):7.2f} ms  "
+        f"p99 {latency.get('p99_ms', 0):7.2f} ms  errors {result['errors']}"
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load-test the simulator HTTP API and record latency percentiles"
+    )
+    parser.add_argument(
+        "--url",
+        default=None,
+        help="Benchmark an already running server instead of starting one",
+    )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Run the server in a thread of this process instead of a separate "
+        "uvicorn process (client and server then share the GIL)",
+    )
+    parser.add_argument(
+        "--workdir",
+        default=None,
+        help="Working directory of the started server (default: a temp directory)",
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=list(MODES),
+        default=list(MODES),
+        help="Simulation modes to measure under",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 8, 32],
+        help="Numbers of concurrent clients",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10, help="Seconds measured per run"
+    )
+    parser.add_argument(
+        "--warmup", type=float, default=1, help="Unmeasured seconds before each run"
+    )
+    parser.add_argument(
+        "--mix",
+        default=DEFAULT_MIX,
+        help=f"Request mix as endpoint=weight pairs of {', '.join(ENDPOINTS)}",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--label", default=None, help="Name of the measured version in the results"
+    )
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    output = os.path.abspath(args.output)
+
+    server = None
+    url = args.url
+    if url is None:
+        workdir = args.workdir or tempfile.mkdtemp(prefix="simulator_benchmark_")
+        os.makedirs(workdir, exist_ok=True)
+        server = _Server(workdir, args.in_process)
+        server.start()
+        url = server.url
+
+    started_at = datetime.now().isoformat()
+    results = []
+    try:
+        for mode in args.modes:
+            for concurrency in args.concurrency:
+                results.append(
+                    asyncio.run(
+                        run_scenario(
+                            url,
+                            mode,
+                            concurrency,
+                            weights,
+                            args.warmup,
+                            args.duration,
+                            args.seed,
+                        )
+                    )
+                )
+    finally:
+        if server is not None:
+            server.stop()
+
+    with open(output, "w") as f:
+        json.dump(
+            {
+                "label": args.label,
+                "started_at": started_at,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "server": (
+                    "external"
+                    if args.url
+                    else "in-process" if args.in_process else "uvicorn"
+                ),
+                "mix": weights,
+                "warmup_seconds": args.warmup,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    logger.info(f"Benchmark results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,21 @@ import matplotlib.pyplot as plt
 import numpy as np
 from glob import glob
 from collections import defaultdict
+from simulator.reports import PARQUET_REPORT, read_parquet_report
 
 
 def collect_data(directories):
     file_data = defaultdict(list)
 
     for directory in directories:
+        parquet_path = os.path.join(directory, PARQUET_REPORT)
+        if os.path.exists(parquet_path):
+            # Данные комнат раскладываются под теми же именами, что и CSV-файлы,
+            # чтобы дни в разных форматах усреднялись вместе
+            for room_name, df in read_parquet_report(parquet_path).items():
+                file_data[f"{room_name}_data.csv"].append(df)
+            continue
+
         csv_files = glob(os.path.join(directory, "*.csv"))
 
         for file_path in csv_files:
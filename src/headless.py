@@ -0,0 +1,86 @@
+import argparse
+import logging
+from simulator.simulator import SmartHomeSimulator
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("Headless")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Headless smart home simulation run without wall-clock sleep"
+    )
+    parser.add_argument(
+        "--days", type=float, required=True, help="Number of days to simulate"
+    )
+    parser.add_argument(
+        "--vectorized",
+        action="store_true",
+        help="Use the array-backed physics engine",
+    )
+    parser.add_argument(
+        "--integrator",
+        choices=["euler", "exponential"],
+        default="euler",
+        help="Room physics integrator",
+    )
+    parser.add_argument(
+        "--step-minutes",
+        type=float,
+        default=1,
+        help="Simulated minutes per tick (use with the exponential integrator)",
+    )
+    parser.add_argument(
+        "--weather-trace",
+        default=None,
+        help="Directory of a recorded weather trace to play back",
+    )
+    parser.add_argument(
+        "--topology",
+        default=None,
+        help="JSON file describing the rooms and devices of the house",
+    )
+    parser.add_argument(
+        "--report-format",
+        choices=["csv", "parquet"],
+        default="csv",
+        help="Format of the daily sensor data reports",
+    )
+    parser.add_argument(
+        "--report-fsync",
+        choices=["none", "flush", "close"],
+        default="close",
+        help="When streamed report files are fsynced",
+    )
+    parser.add_argument(
+        "--history",
+        default=None,
+        help="SQLite file to record the sensor history into",
+    )
+    args = parser.parse_args()
+
+    simulator = SmartHomeSimulator(
+        vectorized=args.vectorized,
+        integrator=args.integrator,
+        step_minutes=args.step_minutes,
+        weather_trace=args.weather_trace,
+        topology=args.topology,
+        report_format=args.report_format,
+        history_path=args.history,
+        report_fsync=args.report_fsync,
+    )
+    simulator.recover_reports()
+    result = simulator.fast_forward(args.days)
+    simulator.stop_simulation()
+
+    logger.info(
+        f"Simulated {result['ticks'] * args.step_minutes:g} minutes "
+        f"({result['ticks']} ticks, {result['days_passed']} days) "
+        f"in {result['elapsed_seconds']:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ import logging
 import asyncio
 import json
 import pandas as pd
+from simulator.models import House
+from simulator.registry import SENSOR_TYPES
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -19,6 +21,8 @@ class LLMSmartHomeAgent:
         self.last_check_time = 0
         self.simulator = None
         self.last_action_time = {}
+        self._house_state = None
+        self._house_version = None
 
     async def start(self, smart_home_simulator):
         """Запуск LLM агента"""
@@ -30,7 +34,7 @@ class LLMSmartHomeAgent:
 
         try:
             while self.is_active:
-                house_state = self.simulator.get_house_state()
+                house_state = self._get_house_state()
                 if self.last_check_time > house_state.time_minutes:
                     self.last_check_time = 0
                 if not house_state:
@@ -60,39 +64,74 @@ class LLMSmartHomeAgent:
         finally:
             self.is_active = False
 
+    def _get_house_state(self):
+        """Модель дома из опубликованного снимка: живую модель меняет только
+        цикл тиков, поэтому агент читает устройства только отсюда. Снимок
+        проверяется один раз на версию состояния"""
+        snapshot = self.simulator.state_snapshot()
+        if snapshot.version != self._house_version:
+            self._house_state = House.model_validate(snapshot.data)
+            self._house_version = snapshot.version
+        return self._house_state
+
+    @staticmethod
+    def _devices(house_state, sensors):
+        """Пары (комната, устройство) снимка: датчики или исполнительные"""
+        for room_type, room in house_state.rooms.items():
+            for device in room.devices.values():
+                if (device.type in SENSOR_TYPES) == sensors:
+                    yield room_type, device
+
     def stop(self):
         """Остановка LLM агента"""
         self.is_active = False
         logger.info("LLM Smart Home Agent stopped")
 
+    def get_state(self):
+        """Состояние агента для сохранения в контрольную точку"""
+        return {
+            "observation_day": self.observation_day,
+            "user_actions": self.user_actions,
+            "last_check_time": self.last_check_time,
+            "last_action_time": self.last_action_time,
+        }
+
+    def load_state(self, state):
+        """Восстановление состояния агента из контрольной точки"""
+        self.observation_day = state["observation_day"]
+        self.user_actions = state["user_actions"]
+        self.last_check_time = state["last_check_time"]
+        self.last_action_time = state["last_action_time"]
+        logger.info(
+            f"Agent state restored: {len(self.user_actions)} recorded actions, "
+            f"observation day: {self.observation_day}"
+        )
+
     def _record_user_actions(self, house_state):
         """Запись действий пользователя в день наблюдения"""
         current_time_of_day = house_state.time_minutes
 
-        for room_type, room in house_state.rooms.items():
-            for device_id, device in room.devices.items():
-                if "sensor" in device_id:
-                    continue
-
-                device_key = f"{room_type}_{device_id}"
+        for room_type, device in self._devices(house_state, sensors=False):
+            device_id = device.id
+            device_key = f"{room_type}_{device_id}"
 
-                if device_key not in self.last_action_time or self._is_device_changed(
-                    device_key, device.status
-                ):
-                    action = {
-                        "time_of_day": current_time_of_day,
-                        "room": room_type,
-                        "device_id": device_id,
-                        "status": device.status.copy(),
-                        "environment": self._get_environment_snapshot(house_state),
-                    }
+            if device_key not in self.last_action_time or self._is_device_changed(
+                device_key, device.status
+            ):
+                action = {
+                    "time_of_day": current_time_of_day,
+                    "room": room_type,
+                    "device_id": device_id,
+                    "status": device.status.copy(),
+                    "environment": self._get_environment_snapshot(house_state),
+                }
 
-                    self.user_actions.append(action)
-                    self.last_action_time[device_key] = device.status.copy()
+                self.user_actions.append(action)
+                self.last_action_time[device_key] = device.status.copy()
 
-                    logger.info(
-                        f"Recorded user action: {room_type} - {device_id} - {device.status}"
-                    )
+                logger.info(
+                    f"Recorded user action: {room_type} - {device_id} - {device.status}"
+                )
 
     async def _reproduce_actions(self, house_state):
         """Воспроизведение действий пользователя на основе наблюдений"""
@@ -124,35 +163,33 @@ class LLMSmartHomeAgent:
 
                 logger.info(f"Will perform {len(actions_to_take)} actions")
 
+                updates = []
                 for action in actions_to_take:
-                    try:
-                        if not all(
-                            k in action for k in ["room", "device_id", "status"]
-                        ):
-                            logger.warning(f"Skipping incomplete action: {action}")
-                            continue
+                    if not isinstance(action, dict) or not all(
+                        k in action for k in ["room", "device_id", "status"]
+                    ):
+                        logger.warning(f"Skipping incomplete action: {action}")
+                        continue
 
-                        room = action["room"]
-                        device_id = action["device_id"]
-                        status = action["status"]
+                    logger.info(
+                        f"Attempting to apply action: {action['room']} - {action['device_id']} - {action['status']}"
+                    )
+                    updates.append(
+                        (action["room"], action["device_id"], action["status"])
+                    )
 
+                # Все действия применяются одним пакетом между тиками
+                results = self.simulator.update_devices(updates) if updates else []
+                for (room, device_id, status), result in zip(updates, results):
+                    if result["success"]:
                         logger.info(
-                            f"Attempting to apply action: {room} - {device_id} - {status}"
+                            f"Successfully applied action: {room} - {device_id} - {status}"
                         )
-                        success = self.simulator.update_device(room, device_id, status)
 
-                        if success:
-                            logger.info(
-                                f"Successfully applied action: {room} - {device_id} - {status}"
-                            )
-
-                        else:
-                            logger.error(
-                                f"Failed to apply action: {room} - {device_id} - {status}"
-                            )
-
-                    except Exception as e:
-                        logger.error(f"Error executing action {action}: {str(e)}")
+                    else:
+                        logger.error(
+                            f"Failed to apply action: {room} - {device_id} - {status}"
+                        )
 
         except Exception as e:
             logger.error(f"Error in _reproduce_actions: {str(e)}")
@@ -203,21 +240,13 @@ class LLMSmartHomeAgent:
                 "rooms": {},
             }
 
-            for room_type, room in house_state.rooms.items():
+            for room_type in house_state.rooms:
                 house_state_simplified["rooms"][room_type] = {"devices": {}}
-                for device_id, device in room.devices.items():
-                    if not any(
-                        sensor in device_id
-                        for sensor in [
-                            "temp_sensor",
-                            "humidity_sensor",
-                            "light_sensor",
-                            "motion_sensor",
-                        ]
-                    ):
-                        house_state_simplified["rooms"][room_type]["devices"][
-                            device_id
-                        ] = {"type": device.type, "status": device.status}
+            for room_type, device in self._devices(house_state, sensors=False):
+                house_state_simplified["rooms"][room_type]["devices"][device.id] = {
+                    "type": device.type,
+                    "status": device.status,
+                }
 
             house_state_str = json.dumps(house_state_simplified, indent=2)
 
@@ -363,14 +392,10 @@ class LLMSmartHomeAgent:
             "rooms": {},
         }
 
-        for room_type, room in house_state.rooms.items():
-            room_data = {}
-
-            for device_id, device in room.devices.items():
-                if "sensor" in device_id:
-                    room_data[device_id] = device.status.copy()
-
-            snapshot["rooms"][room_type] = room_data
+        for room_type in house_state.rooms:
+            snapshot["rooms"][room_type] = {}
+        for room_type, device in self._devices(house_state, sensors=True):
+            snapshot["rooms"][room_type][device.id] = device.status.copy()
 
         return snapshot
 
@@ -1,23 +1,57 @@
 import asyncio
+import hashlib
+import json
 import logging
+import math
+import time
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from simulator.models import House, DeviceUpdateRequest, WeatherType
+from simulator.models import (
+    House,
+    DeviceBatchUpdateRequest,
+    DeviceUpdateRequest,
+    WeatherType,
+)
 from simulator.simulator import SmartHomeSimulator
+from simulator.reports import PARQUET_REPORT, read_parquet_report, read_rollups
+from simulator.catalog import ReportCatalog
+from simulator.export import (
+    EXPORT_COMPRESSIONS,
+    EXPORT_FORMATS,
+    EXPORT_MEDIA_TYPES,
+    export_sensor_data,
+    read_report_day,
+    sensor_log_day,
+)
+from simulator.plots import PlotCache, plot_names
+from simulator.rollups import ROLLUP_RESOLUTIONS
+from simulator.stream import StateBroadcaster
 from virtual_user.virtual_user import VirtualUser
 from llm_agent.llm_agent import LLMSmartHomeAgent
 import asyncio
 import threading
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
 import os
 
 logger = logging.getLogger(__name__)
 
 virtual_user = None
+virtual_user_checkpoint = None
 llm_agent = None
+llm_agent_checkpoint = None
+
+CHECKPOINTS_DIR = "checkpoints"
 
 app = FastAPI(title="Smart Home Simulator")
 
@@ -29,17 +63,58 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-simulator = SmartHomeSimulator()
+# Симулятор и связанные с ним службы создаются при запуске сервера, а не при
+# импорте модуля: процессы обработчика отчётов (forkserver/spawn) импортируют
+# главный модуль заново, и второй симулятор открыл бы историю и каталог отчётов
+# параллельно с сервером
+simulator: Optional[SmartHomeSimulator] = None
+report_catalog: Optional[ReportCatalog] = None
+plot_cache: Optional[PlotCache] = None
+state_broadcaster: Optional[StateBroadcaster] = None
+
+
+def create_services():
+    """Создаёт симулятор, каталог отчётов, кэш графиков и рассылку состояния"""
+    global simulator, report_catalog, plot_cache, state_broadcaster
+    simulator = SmartHomeSimulator(
+        topology=os.environ.get("SIMULATOR_TOPOLOGY"),
+        report_format=os.environ.get("SIMULATOR_REPORT_FORMAT", "csv"),
+        history_path=os.environ.get("SIMULATOR_HISTORY", "history/history.sqlite3"),
+        report_flush_ticks=int(os.environ.get("SIMULATOR_REPORT_FLUSH_TICKS", "60")),
+        report_fsync=os.environ.get("SIMULATOR_REPORT_FSYNC", "close"),
+    )
+    report_catalog = ReportCatalog()
+    simulator.report_listeners.append(report_catalog.update)
+    plot_cache = PlotCache(
+        max_bytes=int(os.environ.get("SIMULATOR_PLOT_CACHE_MB", "256")) * 2**20
+    )
+    state_broadcaster = StateBroadcaster(
+        min_interval=float(os.environ.get("SIMULATOR_STREAM_INTERVAL", "0.1"))
+    )
+    simulator.snapshot_listeners.append(state_broadcaster.on_snapshot)
+
+
+# Наибольшее число дней одной ускоренной прокрутки
+MAX_FAST_FORWARD_DAYS = 365
+
+# Наибольшее число дней в одной выгрузке /api/export
+MAX_EXPORT_DAYS = 1000
+
+# Интервал комментария-пинга в потоке состояния, чтобы прокси не рвали соединение
+STREAM_KEEPALIVE_SECONDS = 15
 
 
 @app.on_event("startup")
 async def startup_event():
+    create_services()
+    simulator.recover_reports()
     asyncio.create_task(simulator.start_simulation())
 
 
 @app.on_event("shutdown")
 def shutdown_event():
-    simulator.stop_simulation()
+    if simulator is not None:
+        simulator.stop_simulation()
     global llm_agent
     if llm_agent and llm_agent.is_active:
         llm_agent.stop()
@@ -50,10 +125,57 @@ def read_root():
     return {"message": "Smart Home Simulator API"}
 
 
-@app.get("/api/state", response_model=House)
-def get_house_state():
-    """Получить текущее состояние дома"""
-    return simulator.get_house_state()
+@app.get("/api/state", responses={200: {"model": House}})
+def get_house_state(
+    since: Optional[int] = Query(None, ge=0),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Получить текущее состояние дома. С since - только изменения после этой
+    версии. ETag ответа - "<эпоха>-<версия>": номер версии для следующего since
+    берётся из него (ответ с изменениями дублирует его в поле version, в полном
+    состоянии такого поля нет). При совпадении ETag с If-None-Match
+    возвращается 304 без тела. Полное состояние отдаётся готовым JSON из
+    общего снимка, без повторной сериализации"""
+    snapshot = simulator.state_snapshot()
+    etag = snapshot.etag
+    if if_none_match is not None and etag in (
+        tag.strip() for tag in if_none_match.split(",")
+    ):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    if since is not None:
+        delta = simulator.get_state_delta(since)
+        etag = simulator.state_tracker.etag(delta["version"])
+        return JSONResponse(delta, headers={"ETag": etag})
+    return Response(
+        snapshot.body, media_type="application/json", headers={"ETag": etag}
+    )
+
+
+@app.get("/api/state/stream")
+async def stream_house_state(request: Request):
+    """Поток состояния дома (Server-Sent Events): событие state после тиков
+    симуляции, не чаще SIMULATOR_STREAM_INTERVAL секунд"""
+    queue = state_broadcaster.subscribe()
+
+    async def events():
+        try:
+            yield StateBroadcaster.encode(simulator.state_snapshot())
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(
+                        queue.get(), timeout=STREAM_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            state_broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/api/device")
@@ -61,21 +183,6 @@ def update_device(request: DeviceUpdateRequest):
     """Обновить состояние устройства"""
     logger.info(f"Device update request: {request.dict()}")
 
-    house_state = simulator.get_house_state()
-    if request.room in house_state.rooms:
-        room = house_state.rooms[request.room]
-        if request.device_id in room.devices:
-            device = room.devices[request.device_id]
-            logger.debug(
-                f"Device found: {device.type}, current status: {device.status}"
-            )
-        else:
-            logger.warning(
-                f"Device {request.device_id} not found in room {request.room}"
-            )
-    else:
-        logger.warning(f"Room {request.room} not found")
-
     success = simulator.update_device(request.room, request.device_id, request.status)
     if not success:
         logger.error(
@@ -88,6 +195,21 @@ def update_device(request: DeviceUpdateRequest):
     return {"success": True}
 
 
+@app.post("/api/devices/batch")
+def update_devices(request: DeviceBatchUpdateRequest):
+    """Обновить несколько устройств за один запрос. Пакет применяется целиком
+    между тиками симуляции; при atomic=true ошибка в одном обновлении отменяет
+    все. Результат возвращается по каждому обновлению"""
+    results = simulator.update_devices(
+        [(update.room, update.device_id, update.status) for update in request.updates],
+        atomic=request.atomic,
+    )
+    return {
+        "success": all(result["success"] for result in results),
+        "results": results,
+    }
+
+
 @app.post("/api/simulation/speed")
 def set_simulation_speed(data: dict):
     """Установить скорость симуляции"""
@@ -114,19 +236,48 @@ def set_simulation_speed(data: dict):
     return {"success": True, "speed": speed}
 
 
+@app.post("/api/simulation/fast_forward")
+def fast_forward_simulation(data: dict):
+    """Прокрутить симуляцию на несколько дней без ожидания реального времени"""
+    days = data.get("days")
+
+    if days is None:
+        raise HTTPException(status_code=400, detail="Days parameter is required")
+
+    try:
+        days = float(days)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Days must be a number")
+
+    if not math.isfinite(days):
+        raise HTTPException(status_code=400, detail="Days must be a finite number")
+    if days <= 0:
+        raise HTTPException(status_code=400, detail="Days must be positive")
+    if days > MAX_FAST_FORWARD_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Days must not exceed {MAX_FAST_FORWARD_DAYS}",
+        )
+
+    result = simulator.fast_forward(days)
+
+    return {"success": True, **result}
+
+
 @app.get("/api/time")
 def get_time():
     """Получить текущее время симуляции и погоду"""
-    minutes = simulator.house.time_minutes
+    state = simulator.state_snapshot().data
+    minutes = state["time_minutes"]
     hours = minutes // 60
     mins = minutes % 60
 
     return {
         "hours": hours,
         "minutes": mins,
-        "time_of_day": simulator.house.time_of_day,
+        "time_of_day": state["time_of_day"],
         "formatted": f"{hours:02d}:{mins:02d}",
-        "weather": simulator.house.weather,
+        "weather": state["weather"],
     }
 
 
@@ -156,7 +307,12 @@ async def start_virtual_user():
     if virtual_user is not None and virtual_user.is_active:
         return {"message": "Virtual user is already running"}
 
+    global virtual_user_checkpoint
+
     virtual_user = VirtualUser()
+    if virtual_user_checkpoint is not None:
+        virtual_user.load_state(virtual_user_checkpoint)
+        virtual_user_checkpoint = None
 
     threading.Thread(
         target=asyncio.run, args=(virtual_user.start(simulator),), daemon=True
@@ -199,7 +355,12 @@ async def start_llm_agent():
     if llm_agent is not None and llm_agent.is_active:
         return {"message": "LLM agent is already running"}
 
+    global llm_agent_checkpoint
+
     llm_agent = LLMSmartHomeAgent()
+    if llm_agent_checkpoint is not None:
+        llm_agent.load_state(llm_agent_checkpoint)
+        llm_agent_checkpoint = None
 
     threading.Thread(
         target=asyncio.run, args=(llm_agent.start(simulator),), daemon=True
@@ -228,7 +389,7 @@ def get_llm_agent_status():
     if llm_agent is None:
         return {"active": False}
 
-    days_passed = simulator.house.days_passed
+    days_passed = simulator.state_snapshot().data["days_passed"]
 
     return {
         "active": llm_agent.is_active,
@@ -238,49 +399,373 @@ def get_llm_agent_status():
     }
 
 
-app.mount("/reports", StaticFiles(directory="reports"), name="reports")
+def _checkpoint_path(name) -> str:
+    if not name or not isinstance(name, str) or os.path.basename(name) != name:
+        raise HTTPException(status_code=400, detail="Invalid checkpoint name")
+    path = os.path.join(CHECKPOINTS_DIR, f"{name}.ckpt")
+    # Контрольные точки читаются и пишутся только в своём каталоге (в том
+    # числе через символические ссылки)
+    root = os.path.realpath(CHECKPOINTS_DIR)
+    if os.path.dirname(os.path.realpath(path)) != root:
+        raise HTTPException(status_code=400, detail="Invalid checkpoint name")
+    return path
 
 
-@app.get("/api/reports")
-def get_reports():
-    """Получить список доступных отчетов"""
+@app.post("/api/checkpoint/save")
+def save_checkpoint(data: dict):
+    """Сохранить состояние симулятора и агента в контрольную точку"""
+    path = _checkpoint_path(data.get("name"))
+
+    extra = {}
+    if llm_agent is not None:
+        extra["llm_agent"] = llm_agent.get_state()
+    elif llm_agent_checkpoint is not None:
+        extra["llm_agent"] = llm_agent_checkpoint
+    if virtual_user is not None:
+        extra["virtual_user"] = virtual_user.get_state()
+    elif virtual_user_checkpoint is not None:
+        extra["virtual_user"] = virtual_user_checkpoint
+
+    simulator.save_checkpoint(path, extra)
+
+    return {"success": True, "name": data["name"]}
+
+
+@app.post("/api/checkpoint/load")
+def load_checkpoint(data: dict):
+    """Восстановить состояние симулятора, агента и виртуального пользователя
+    из контрольной точки"""
+    global llm_agent_checkpoint, virtual_user_checkpoint
+
+    path = _checkpoint_path(data.get("name"))
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Checkpoint not found")
+
     try:
-        if not os.path.exists("reports"):
-            return {"days": []}
+        extra = simulator.load_checkpoint(path)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    agent_state = extra.get("llm_agent")
+    if agent_state is not None:
+        if llm_agent is not None and llm_agent.is_active:
+            llm_agent.load_state(agent_state)
+        else:
+            llm_agent_checkpoint = agent_state
 
-        day_dirs = [
-            d
-            for d in os.listdir("reports")
-            if os.path.isdir(os.path.join("reports", d))
-        ]
+    user_state = extra.get("virtual_user")
+    if user_state is not None:
+        if virtual_user is not None and virtual_user.is_active:
+            virtual_user.load_state(user_state)
+        else:
+            virtual_user_checkpoint = user_state
+
+    state = simulator.state_snapshot().data
+    return {
+        "success": True,
+        "name": data["name"],
+        "days_passed": state["days_passed"],
+        "time_minutes": state["time_minutes"],
+    }
 
-        reports_info = []
-        for day_dir in day_dirs:
-            day_path = os.path.join("reports", day_dir)
-            files = os.listdir(day_path)
 
-            csv_files = [f for f in files if f.endswith(".csv")]
-            image_files = [f for f in files if f.endswith(".png")]
+@app.get("/api/checkpoints")
+def get_checkpoints():
+    """Получить список сохранённых контрольных точек"""
+    if not os.path.exists(CHECKPOINTS_DIR):
+        return {"checkpoints": []}
+
+    names = [
+        f[: -len(".ckpt")] for f in os.listdir(CHECKPOINTS_DIR) if f.endswith(".ckpt")
+    ]
+    return {"checkpoints": sorted(names)}
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Метрики цикла симуляции в формате Prometheus"""
+    return PlainTextResponse(
+        simulator.metrics.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/api/history")
+def get_history(
+    room: str,
+    metric: str,
+    start: Optional[int] = Query(None, alias="from"),
+    end: Optional[int] = Query(None, alias="to"),
+    resolution: str = "1",
+    run: Optional[int] = None,
+):
+    """Получить историю показаний датчика комнаты.
+
+    from и to - абсолютные минуты симуляции (день * 1440 + минута дня).
+    resolution - длина интервала усреднения в минутах либо готовые агрегаты
+    min/mean/max: "15min", "hour" или "day". run - номер запуска сервера
+    (см. /api/history/runs), по умолчанию текущий.
+    """
+    if simulator.history is None:
+        raise HTTPException(status_code=404, detail="History store is disabled")
+
+    try:
+        if resolution in ROLLUP_RESOLUTIONS:
+            history = simulator.history.query_rollups(
+                room, metric, resolution, start, end, run
+            )
+        else:
+            if not resolution.isdigit() or int(resolution) < 1:
+                raise ValueError(f"Invalid resolution: {resolution}")
+            history = simulator.history.query(
+                room, metric, start, end, int(resolution), run
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if history is None:
+        raise HTTPException(status_code=404, detail=f"Room {room} not found")
+    return history
+
+
+@app.get("/api/history/runs")
+def get_history_runs():
+    """Получить список запусков, история которых сохранена"""
+    if simulator.history is None:
+        raise HTTPException(status_code=404, detail="History store is disabled")
+    return {"runs": simulator.history.runs()}
+
+
+# Каталог отчётов создаёт симулятор при запуске сервера
+app.mount("/reports", StaticFiles(directory="reports", check_dir=False), name="reports")
+
+
+def _not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """Проверяет условный запрос: If-None-Match важнее If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    return False
+
+
+def _validators(etag: str, last_modified: float) -> dict:
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        # Файлы текущего дня дописываются, поэтому кэш всегда перепроверяется
+        "Cache-Control": "no-cache",
+    }
+
+
+def _file_validators(path: str, suffix: str = "") -> tuple:
+    stat = os.stat(path)
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{suffix}"', stat.st_mtime
+
+
+@app.get("/api/reports")
+def get_reports(
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    day_from: Optional[int] = Query(None, ge=0),
+    day_to: Optional[int] = Query(None, ge=0),
+):
+    """Получить список доступных отчетов (от последних дней к первым) из
+    каталога отчётов, без обхода каталогов на диске"""
+    try:
+        total, reports = report_catalog.query(day_from, day_to, offset, limit)
+        current_report_id = simulator.current_report_id()
+
+        reports_info = []
+        for report in reports:
+            day_id = report["day_id"]
+            image_files = list(report["image_files"])
+            pending_image_files = []
+
+            # Графики строятся при первом запросе: ещё не построенные
+            # перечисляются отдельно
+            for plot_name in plot_names(report["rooms"]):
+                if plot_name in report["image_files"]:
+                    continue
+                if plot_cache.is_rendered(day_id, plot_name):
+                    image_files.append(plot_name)
+                else:
+                    pending_image_files.append(plot_name)
 
             reports_info.append(
-                {"day_id": day_dir, "csv_files": csv_files, "image_files": image_files}
+                {
+                    **report,
+                    "in_progress": day_id == current_report_id,
+                    "image_files": image_files,
+                    "pending_image_files": pending_image_files,
+                }
             )
 
-        return {"days": reports_info}
+        body = json.dumps(
+            {
+                "days": reports_info,
+                "total": total,
+                "offset": offset,
+                "limit": limit,
+                "jobs": simulator.reports.jobs(),
+            }
+        ).encode()
     except Exception as e:
         logger.error(f"Error getting reports: {e}")
-        return {"days": [], "error": str(e)}
+        return {"days": [], "jobs": simulator.reports.jobs(), "error": str(e)}
+
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = _validators(etag, report_catalog.modified)
+    if _not_modified(request, etag, report_catalog.modified):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _report_path(day_id: str, file_name: Optional[str] = None) -> str:
+    """Путь к каталогу отчёта за день или к его файлу. Принимаются только
+    простые имена, не выходящие за каталог отчётов (в том числе через
+    символические ссылки)"""
+    names = [day_id] if file_name is None else [day_id, file_name]
+    if any(name in ("", ".", "..") or os.path.basename(name) != name for name in names):
+        raise HTTPException(status_code=400, detail="Invalid report path")
+    path = os.path.join("reports", *names)
+    root = os.path.realpath("reports")
+    if os.path.commonpath([root, os.path.realpath(path)]) != root:
+        raise HTTPException(status_code=400, detail="Invalid report path")
+    return path
+
+
+@app.get("/api/reports/{day_id}/rollups")
+def get_report_rollups(
+    day_id: str, resolution: str = "hour", room: Optional[str] = None
+):
+    """Получить агрегаты min/mean/max за день из отчёта"""
+    if resolution not in ROLLUP_RESOLUTIONS:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown rollup resolution: {resolution}"
+        )
+
+    df = read_rollups(_report_path(day_id))
+    if df is None:
+        raise HTTPException(status_code=404, detail="Rollups not found")
+
+    df = df[df["resolution"] == resolution]
+    if room is not None:
+        df = df[df["room"] == room]
+
+    rooms = {
+        str(room_name): room_df.drop(columns=["resolution", "room"]).to_dict("list")
+        for room_name, room_df in df.groupby("room", sort=False)
+    }
+    return {"day_id": day_id, "resolution": resolution, "rooms": rooms}
 
 
 @app.get("/api/reports/{day_id}/{file_name}")
-def get_report_file(day_id: str, file_name: str):
-    """Получить конкретный файл отчета"""
-    file_path = os.path.join("reports", day_id, file_name)
+def get_report_file(request: Request, day_id: str, file_name: str):
+    """Получить конкретный файл отчета (с ETag/Last-Modified и ответом 304 на
+    условный запрос)"""
+    file_path = _report_path(day_id, file_name)
+    parquet_path = os.path.join(_report_path(day_id), PARQUET_REPORT)
 
     if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Report file not found")
+        # Для дней в формате Parquet CSV комнаты собирается на лету
+        if file_name.endswith("_data.csv") and os.path.exists(parquet_path):
+            etag, last_modified = _file_validators(parquet_path, f"-{file_name}")
+            headers = _validators(etag, last_modified)
+            if _not_modified(request, etag, last_modified):
+                return Response(status_code=304, headers=headers)
+            room_data = read_parquet_report(parquet_path).get(
+                file_name[: -len("_data.csv")]
+            )
+            if room_data is not None:
+                return Response(
+                    room_data.to_csv(index=False),
+                    media_type="text/csv",
+                    headers=headers,
+                )
+        if file_name.endswith(".png"):
+            plot_path = plot_cache.get(day_id, file_name)
+            if plot_path is not None:
+                file_path = plot_path
+        if not os.path.exists(file_path):
+            raise HTTPException(status_code=404, detail="Report file not found")
+
+    etag, last_modified = _file_validators(file_path)
+    headers = _validators(etag, last_modified)
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(file_path, headers=headers)
+
+
+@app.get("/api/export")
+def export_sensor_history(
+    request: Request,
+    day_from: Optional[int] = Query(None, ge=0),
+    day_to: Optional[int] = Query(None, ge=0),
+    format: str = "arrow",
+    compression: str = "none",
+):
+    """Выгрузить показания датчиков за дни [day_from, day_to] одним бинарным
+    ответом: поток Arrow IPC (format=arrow) или сырые массивы float32 с
+    заголовком (format=f32, см. simulator.export.encode_f32). Тело можно сжать
+    gzip или zstd (Content-Encoding). Завершённые дни читаются из отчётов,
+    текущий - из буфера симулятора"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown export format: {format}")
+    if compression not in EXPORT_COMPRESSIONS:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown compression: {compression}"
+        )
+
+    total, reports = report_catalog.query(day_from, day_to, 0, MAX_EXPORT_DAYS)
+    if total > MAX_EXPORT_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many days to export: {total} (max {MAX_EXPORT_DAYS})",
+        )
+    if not reports:
+        raise HTTPException(status_code=404, detail="No sensor data for these days")
+    reports.reverse()
+
+    # Текущий день берётся из копии буфера, а не из дописываемых файлов
+    current = None
+    if simulator.current_report_id() in {report["day_id"] for report in reports}:
+        current = simulator.sensor_log_snapshot()
+
+    versions = [
+        (report["day_id"], report["modified"])
+        for report in reports
+        if current is None or report["day_id"] != current[0]
+    ]
+    last_modified = max((modified for _, modified in versions), default=0.0)
+    if current is not None:
+        versions.append((current[0], len(current[2])))
+        last_modified = time.time()
+    key = json.dumps([versions, format, compression]).encode()
+    etag = f'"{hashlib.blake2b(key, digest_size=16).hexdigest()}"'
+    headers = _validators(etag, last_modified)
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    days = []
+    for report in reports:
+        if current is not None and report["day_id"] == current[0]:
+            days.append(sensor_log_day(*current))
+        else:
+            report_dir = os.path.join("reports", report["day_id"])
+            days.append(read_report_day(report_dir, report["day"]))
 
-    return FileResponse(file_path)
+    body, encoding = export_sensor_data(days, format, compression)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,294 @@
+import math
+import logging
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+from .models import RoomType, WeatherType
+from .trace import WeatherTrace
+from .engine import INTEGRATORS, light_level
+
+logger = logging.getLogger(__name__)
+
+ROOMS = list(RoomType)
+WEATHERS = list(WeatherType)
+ACTUATORS = [
+    "brightness",
+    "curtain_open",
+    "window_open",
+    "ac_power",
+    "ac_target",
+    "ac_intensity",
+    "climate_power",
+    "climate_target",
+    "climate_intensity",
+]
+
+
+class BatchSimulator:
+    """Пакетный симулятор: N независимых домов с общими часами, состояние хранится
+    в массивах формы (дома, комнаты), у каждого дома свой поток случайных чисел"""
+
+    def __init__(
+        self,
+        n_houses: int,
+        seed: Optional[int] = None,
+        reports_dir: Optional[str] = None,
+        integrator: str = "euler",
+        weather_trace: Optional[str] = None,
+        trace_offsets=None,
+    ):
+        self.n_houses = n_houses
+        self.update_temperature, self.update_humidity = INTEGRATORS[integrator]
+        self.rooms = ROOMS
+        shape = (n_houses, len(ROOMS))
+        bathroom = ROOMS.index(RoomType.BATHROOM)
+
+        self.rngs = [
+            np.random.default_rng(s)
+            for s in np.random.SeedSequence(seed).spawn(n_houses)
+        ]
+
+        self.temperature = np.full(shape, 22.0)
+        self.humidity = np.full(shape, 50.0)
+        self.humidity[:, bathroom] = 65.0
+        self.light_level = np.full(shape, 50.0)
+
+        self.brightness = np.zeros(shape)
+        self.curtain_open = np.zeros(shape)
+        self.window_open = np.zeros(shape)
+        self.has_opening = np.ones(shape, dtype=bool)
+        self.has_opening[:, bathroom] = False
+        self.ac_power = np.zeros(shape, dtype=bool)
+        self.ac_power[:, bathroom] = True
+        self.ac_target = np.full(shape, 22.0)
+        self.ac_intensity = np.full(shape, 0.1)
+        self.ac_intensity[:, bathroom] = 0.3
+        self.climate_power = np.zeros(shape, dtype=bool)
+        self.climate_target = np.full(shape, 50.0)
+        self.climate_intensity = np.full(shape, 0.1)
+        self.climate_intensity[:, bathroom] = 0.3
+
+        self.weather = np.zeros(n_houses, dtype=np.int8)
+        self.outside_temp = np.full(n_houses, 20.0)
+        self.outside_humidity = np.full(n_houses, 50.0)
+        self.outside_light = np.full(n_houses, 50.0)
+
+        self.time_of_day = 1.0
+        self.time_minutes = 60
+        self.days_passed = 0
+        self.last_day_time = 0
+        self.weather_change_counter = 0
+
+        self.reports_dir = reports_dir
+        self.weather_trace = WeatherTrace(weather_trace) if weather_trace else None
+        self.trace_offsets = (
+            np.zeros(n_houses, dtype=np.int64)
+            if trace_offsets is None
+            else np.asarray(trace_offsets, dtype=np.int64)
+        )
+
+        self._log_time = np.zeros(1440, dtype=np.int32)
+        self._log = {
+            metric: np.zeros((1440,) + shape)
+            for metric in ["temperature", "humidity", "light"]
+        }
+        self._log_count = 0
+
+        self._noise = None
+        self._noise_index = 0
+
+    def set_actuator(self, name: str, value, houses=slice(None), rooms=None):
+        """Задаёт настройку исполнительного устройства для выбранных домов и комнат"""
+        if name not in ACTUATORS:
+            raise ValueError(f"Unknown actuator: {name}")
+        if rooms is None:
+            room_index = slice(None)
+        elif isinstance(rooms, (list, tuple)):
+            room_index = [ROOMS.index(RoomType(r)) for r in rooms]
+        else:
+            room_index = ROOMS.index(RoomType(rooms))
+
+        if name in ["curtain_open", "window_open", "ac_intensity", "climate_intensity"]:
+            value = np.asarray(value) / 100.0
+
+        getattr(self, name)[houses, room_index] = value
+
+    def set_weather(self, weather: WeatherType, houses=slice(None)):
+        """Задаёт погоду для выбранных домов"""
+        self.weather[houses] = WEATHERS.index(WeatherType(weather))
+
+    def _draw_noise(self):
+        """Заранее вытягивает случайные числа на сутки вперёд из потока каждого дома"""
+        noise = np.empty((3, self.n_houses, 1440))
+        for i, rng in enumerate(self.rngs):
+            noise[:, i, :] = rng.random((3, 1440))
+        self._noise = noise
+        self._noise_index = 0
+
+    def _next_noise(self):
+        if self._noise is None or self._noise_index >= 1440:
+            self._draw_noise()
+        values = self._noise[:, :, self._noise_index]
+        self._noise_index += 1
+        return values
+
+    def step(self, elapsed_sim_time: float = 1):
+        """Продвигает все дома на elapsed_sim_time минут"""
+        self._log_sensor_data()
+
+        minutes_in_day = 1440
+        new_minutes = self.time_of_day * 60 + elapsed_sim_time
+
+        if int(new_minutes / minutes_in_day) > int(self.last_day_time / minutes_in_day):
+            self.days_passed += 1
+            logger.info(f"New day started: Day {self.days_passed}")
+            self._on_day_change()
+
+        self.last_day_time = new_minutes
+        new_minutes = new_minutes % minutes_in_day
+        self.time_of_day = new_minutes / 60
+        self.time_minutes = int(new_minutes)
+
+        self._update_environment(elapsed_sim_time)
+
+        window_open = self.window_open * self.has_opening
+        self.temperature = self.update_temperature(
+            self.temperature,
+            self.outside_temp[:, None],
+            window_open,
+            self.ac_power,
+            self.ac_target,
+            self.ac_intensity,
+            elapsed_sim_time,
+        )
+        self.humidity = self.update_humidity(
+            self.humidity,
+            self.outside_humidity[:, None],
+            window_open,
+            self.climate_power,
+            self.climate_target,
+            self.climate_intensity,
+            elapsed_sim_time,
+        )
+        self.light_level = light_level(
+            self.outside_light[:, None],
+            self.brightness,
+            self.curtain_open,
+            self.window_open,
+            self.has_opening,
+        )
+
+    def run(self, days: float, step_minutes: float = 1):
+        """Прокручивает все дома на заданное число дней"""
+        for _ in range(int(days * 1440 / step_minutes)):
+            self.step(step_minutes)
+
+    def _update_environment(self, elapsed_time: float):
+        """Обновляет внешние условия всех домов (время в минутах)"""
+        if self.weather_trace:
+            minute = self.days_passed * 1440 + self.time_minutes
+            i = self.weather_trace.index(minute + self.trace_offsets)
+            columns = self.weather_trace.columns
+            self.outside_temp = columns["outside_temp"][i].astype(np.float64)
+            self.outside_humidity = columns["outside_humidity"][i].astype(np.float64)
+            self.outside_light = columns["outside_light"][i].astype(np.float64)
+            self.weather = columns["weather"][i].astype(np.int8)
+            return
+
+        weather_roll, weather_choice, humidity_roll = self._next_noise()
+
+        self.weather_change_counter += elapsed_time
+        hours = 0
+        while self.weather_change_counter >= 60:
+            self.weather_change_counter -= 60
+            if hours:
+                # Шаг длиннее часа: на каждый следующий час свои случайные числа
+                weather_roll, weather_choice, _ = self._next_noise()
+            hours += 1
+            change = weather_roll < 0.1
+            shift = np.where(weather_choice < 0.5, 1, 2)
+            self.weather = np.where(
+                change, (self.weather + shift) % len(WEATHERS), self.weather
+            ).astype(np.int8)
+
+        cloudy = self.weather == WEATHERS.index(WeatherType.CLOUDY)
+        rainy = self.weather == WEATHERS.index(WeatherType.RAINY)
+
+        hour_temp_factor = math.sin((self.time_of_day - 6) * math.pi / 12)
+        self.outside_temp = 20 + 10 * hour_temp_factor - 3 * cloudy - 5 * rainy
+
+        if 6 <= self.time_of_day <= 18:
+            light_factor = np.where(cloudy, 0.6, np.where(rainy, 0.4, 1.0))
+            self.outside_light = 100 * hour_temp_factor * light_factor
+        else:
+            self.outside_light = np.full(self.n_houses, 5.0)
+
+        humidity_change = (humidity_roll * 0.2 - 0.1) * math.sqrt(elapsed_time)
+        humidity_change += 0.2 * elapsed_time * rainy
+        self.outside_humidity = np.clip(self.outside_humidity + humidity_change, 30, 90)
+
+    def _log_sensor_data(self):
+        """Записывает текущие показания датчиков всех домов в дневной буфер.
+        При шаге меньше минуты строк за день больше 1440, и буфер растёт"""
+        i = self._log_count
+        if i >= len(self._log_time):
+            self._grow_log()
+        self._log_time[i] = self.time_minutes
+        self._log["temperature"][i] = self.temperature
+        self._log["humidity"][i] = self.humidity
+        self._log["light"][i] = self.light_level
+        self._log_count += 1
+
+    def _grow_log(self):
+        """Удваивает дневной буфер, сохраняя записанные строки"""
+        size = 2 * len(self._log_time)
+        self._log_time = np.resize(self._log_time, size)
+        for metric, values in self._log.items():
+            grown = np.zeros((size,) + values.shape[1:])
+            grown[: len(values)] = values
+            self._log[metric] = grown
+
+    def get_sensor_data(self, house: int) -> Dict:
+        """Возвращает логи датчиков одного дома в формате SmartHomeSimulator.sensor_data"""
+        n = self._log_count
+        time_list = self._log_time[:n].tolist()
+        return {
+            room_type.value: {
+                "time": time_list,
+                "temperature": self._log["temperature"][:n, house, r].tolist(),
+                "humidity": self._log["humidity"][:n, house, r].tolist(),
+                "light": self._log["light"][:n, house, r].tolist(),
+            }
+            for r, room_type in enumerate(ROOMS)
+        }
+
+    def write_reports(self, report_dir: str, houses: Optional[List[int]] = None):
+        """Записывает CSV-отчёты по домам в том же формате, что и _generate_reports"""
+        n = self._log_count
+        minutes = self._log_time[:n]
+        formatted_time = [f"{t//60:02d}:{t%60:02d}" for t in minutes]
+        houses = range(self.n_houses) if houses is None else houses
+
+        for house in houses:
+            house_dir = f"{report_dir}/house_{house}"
+            os.makedirs(house_dir, exist_ok=True)
+            for r, room_type in enumerate(ROOMS):
+                df = pd.DataFrame(
+                    {
+                        "time": formatted_time,
+                        "time_minutes": minutes,
+                        "temperature": self._log["temperature"][:n, house, r],
+                        "humidity": self._log["humidity"][:n, house, r],
+                        "light": self._log["light"][:n, house, r],
+                    }
+                )
+                df.to_csv(f"{house_dir}/{room_type.value}_data.csv", index=False)
+
+        logger.info(f"Batch CSV reports for {len(houses)} houses saved to {report_dir}")
+
+    def _on_day_change(self):
+        """Обработчик смены дня: сохраняет отчёты и очищает дневной буфер"""
+        if self.reports_dir:
+            self.write_reports(f"{self.reports_dir}/day_{self.days_passed}")
+        self._log_count = 0
@@ -0,0 +1,164 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from .reports import (
+    JOURNAL_REPORT,
+    PARQUET_REPORT,
+    read_parquet_metadata,
+    report_rooms,
+)
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+
+
+def _day_number(day_id: str) -> int:
+    """Номер дня из имени каталога отчёта day_<N>_<время>"""
+    parts = day_id.split("_")
+    if len(parts) > 1 and parts[0] == "day" and parts[1].isdigit():
+        return int(parts[1])
+    return 0
+
+
+def scan_report(report_dir: str) -> Dict:
+    """Описание отчёта за день по содержимому его каталога"""
+    day_id = os.path.basename(report_dir)
+    entries = sorted(os.scandir(report_dir), key=lambda entry: entry.name)
+    files = [entry.name for entry in entries]
+
+    report = {
+        "day_id": day_id,
+        "day": _day_number(day_id),
+        "csv_files": [f for f in files if f.endswith(".csv")],
+        "image_files": [f for f in files if f.endswith(".png")],
+    }
+    if PARQUET_REPORT in files:
+        report["parquet_file"] = PARQUET_REPORT
+        report.update(read_parquet_metadata(os.path.join(report_dir, PARQUET_REPORT)))
+    else:
+        report["rooms"] = report_rooms(report_dir)
+    report["modified"] = max((entry.stat().st_mtime for entry in entries), default=0.0)
+    return report
+
+
+class ReportCatalog:
+    """Каталог дневных отчётов в памяти с индексом на диске (reports/index.json).
+
+    Отчёт попадает в каталог, когда симулятор начинает его писать, и
+    обновляется, когда задание на его завершение закончилось; в индекс на
+    диске попадают только завершённые отчёты. При запуске индекс сверяется
+    со списком каталогов: новые и незавершённые (с журналом или без списка
+    комнат) отчёты сканируются, удалённые выбрасываются.
+    Отчёты упорядочены по номеру дня, поэтому выборка диапазона дней и
+    страницы не зависит от общего числа отчётов.
+    """
+
+    def __init__(self, reports_dir: str = "reports"):
+        self.reports_dir = reports_dir
+        self.index_path = os.path.join(reports_dir, INDEX_FILE)
+        self.modified = time.time()
+        self._lock = threading.Lock()
+        self._reports: Dict[str, Dict] = {}
+        self._order: List[Tuple[int, str]] = []
+        # Отчёты, которые ещё пишутся: в индекс на диске не сохраняются
+        self._in_progress: Set[str] = set()
+        self._load()
+
+    def _load(self):
+        os.makedirs(self.reports_dir, exist_ok=True)
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+            self._reports = index["days"]
+            self.modified = index["modified"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError) as e:
+            logger.warning(
+                f"Report index {self.index_path} is corrupt, rebuilding: {e}"
+            )
+            self._reports = {}
+
+        day_ids = {
+            entry.name for entry in os.scandir(self.reports_dir) if entry.is_dir()
+        }
+        stale = self._reports.keys() - day_ids
+        missing = day_ids - self._reports.keys()
+        missing |= {
+            day_id
+            for day_id, report in self._reports.items()
+            if day_id in day_ids
+            and (JOURNAL_REPORT in report["csv_files"] or not report.get("rooms"))
+        }
+        for day_id in stale:
+            del self._reports[day_id]
+        for day_id in sorted(missing):
+            self._reports[day_id] = scan_report(os.path.join(self.reports_dir, day_id))
+        self._order = sorted(
+            (report["day"], day_id) for day_id, report in self._reports.items()
+        )
+
+        if stale or missing:
+            self.modified = time.time()
+            self._save()
+        logger.info(
+            f"Report catalog loaded: {len(self._reports)} days "
+            f"({len(missing)} scanned, {len(stale)} removed)"
+        )
+
+    def _save(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            days = {
+                day_id: report
+                for day_id, report in self._reports.items()
+                if day_id not in self._in_progress
+            }
+            json.dump({"modified": self.modified, "days": days}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def update(self, report_dir: str, persist: bool = True):
+        """Пересканирует каталог отчёта за день и обновляет его запись.
+        persist=False - отчёт ещё пишется и в индекс на диске не попадает"""
+        if not os.path.isdir(report_dir):
+            return
+        report = scan_report(report_dir)
+        day_id = report["day_id"]
+        with self._lock:
+            previous = self._reports.get(day_id)
+            if previous is not None:
+                self._order.remove((previous["day"], day_id))
+            self._reports[day_id] = report
+            bisect.insort(self._order, (report["day"], day_id))
+            self.modified = time.time()
+            if persist:
+                self._in_progress.discard(day_id)
+                self._save()
+            else:
+                self._in_progress.add(day_id)
+
+    def query(
+        self,
+        day_from: Optional[int] = None,
+        day_to: Optional[int] = None,
+        offset: int = 0,
+        limit: int = 100,
+    ) -> Tuple[int, List[Dict]]:
+        """Отчёты за дни [day_from, day_to], от последних к первым: общее число
+        и страница из limit отчётов после первых offset"""
+        with self._lock:
+            lo = 0 if day_from is None else bisect.bisect_left(self._order, (day_from,))
+            hi = (
+                len(self._order)
+                if day_to is None
+                else bisect.bisect_left(self._order, (day_to + 1,))
+            )
+            total = max(hi - lo, 0)
+            end = hi - offset
+            page = self._order[max(end - limit, lo) : max(end, lo)]
+            return total, [self._reports[day_id] for _, day_id in reversed(page)]
@@ -0,0 +1,254 @@
+import numpy as np
+from .models import House, DeviceType
+from .registry import DeviceRegistry
+
+
+def step_temperature(
+    temperature,
+    outside_temp,
+    window_open,
+    ac_power,
+    ac_target,
+    ac_intensity,
+    elapsed_time,
+):
+    """Явный шаг Эйлера для температуры (работает и со скалярами, и с массивами)"""
+    ac_factor = np.where(
+        ac_power, (ac_target - temperature) * ac_intensity * 0.05 * elapsed_time, 0.0
+    )
+    natural_change = (outside_temp - temperature) * window_open * 0.005 * elapsed_time
+
+    new_temp = temperature + natural_change + ac_factor
+
+    diff = np.abs(temperature - outside_temp) * 0.002 * elapsed_time
+    return np.where(new_temp > outside_temp, new_temp - diff, new_temp + diff)
+
+
+def step_humidity(
+    humidity,
+    outside_humidity,
+    window_open,
+    climate_power,
+    climate_target,
+    climate_intensity,
+    elapsed_time,
+):
+    """Явный шаг Эйлера для влажности (работает и со скалярами, и с массивами)"""
+    climate_factor = np.where(
+        climate_power,
+        (climate_target - humidity) * climate_intensity * 0.05 * elapsed_time,
+        0.0,
+    )
+    natural_change = (outside_humidity - humidity) * window_open * 0.005 * elapsed_time
+
+    new_humidity = humidity + natural_change + climate_factor
+
+    diff = np.abs(humidity - outside_humidity) * 0.004 * elapsed_time
+    new_humidity = np.where(
+        new_humidity > outside_humidity, new_humidity - diff, new_humidity + diff
+    )
+    return np.clip(new_humidity, 10, 99)
+
+
+def relax_temperature(
+    temperature,
+    outside_temp,
+    window_open,
+    ac_power,
+    ac_target,
+    ac_intensity,
+    elapsed_time,
+):
+    """Точное экспоненциальное решение для температуры на шаге произвольной длины:
+    комната релаксирует к средневзвешенной цели между улицей и кондиционером"""
+    outside_rate = window_open * 0.005 + 0.002
+    ac_rate = np.where(ac_power, ac_intensity * 0.05, 0.0)
+    total_rate = outside_rate + ac_rate
+    target = (outside_rate * outside_temp + ac_rate * ac_target) / total_rate
+    return target + (temperature - target) * np.exp(-total_rate * elapsed_time)
+
+
+def relax_humidity(
+    humidity,
+    outside_humidity,
+    window_open,
+    climate_power,
+    climate_target,
+    climate_intensity,
+    elapsed_time,
+):
+    """Точное экспоненциальное решение для влажности на шаге произвольной длины"""
+    outside_rate = window_open * 0.005 + 0.004
+    climate_rate = np.where(climate_power, climate_intensity * 0.05, 0.0)
+    total_rate = outside_rate + climate_rate
+    target = outside_rate * outside_humidity + climate_rate * climate_target
+    target = target / total_rate
+    new_humidity = target + (humidity - target) * np.exp(-total_rate * elapsed_time)
+    return np.clip(new_humidity, 10, 99)
+
+
+INTEGRATORS = {
+    "euler": (step_temperature, step_humidity),
+    "exponential": (relax_temperature, relax_humidity),
+}
+
+
+def light_level(outside_light, brightness, curtain_open, window_open, has_opening):
+    """Уровень освещенности по яркости ламп и свету из окна"""
+    external_light = np.where(
+        has_opening, outside_light * curtain_open * (1 + window_open) / 2, 0.0
+    )
+    return np.round(np.minimum(100, brightness + external_light), 1)
+
+
+class ArrayEngine:
+    """Векторный движок физики: показания датчиков и настройки устройств всех комнат
+    хранятся в массивах NumPy, а модель House синхронизируется только при чтении"""
+
+    def __init__(self, devices: DeviceRegistry, integrator: str = "euler"):
+        house = devices.house
+        self.house = house
+        self.update_temperature, self.update_humidity = INTEGRATORS[integrator]
+        self.room_names = list(house.rooms.keys())
+        self.room_index = {name: i for i, name in enumerate(self.room_names)}
+        n = len(self.room_names)
+
+        self.temperature = np.zeros(n)
+        self.humidity = np.zeros(n)
+        self.light_level = np.zeros(n)
+
+        self.brightness = np.zeros(n)
+        self.curtain_open = np.zeros(n)
+        self.window_open = np.zeros(n)
+        self.has_opening = np.zeros(n, dtype=bool)
+        self.ac_power = np.zeros(n, dtype=bool)
+        self.ac_target = np.zeros(n)
+        self.ac_intensity = np.zeros(n)
+        self.climate_power = np.zeros(n, dtype=bool)
+        self.climate_target = np.zeros(n)
+        self.climate_intensity = np.zeros(n)
+
+        # Устройства, которых нет в комнате, хранятся как None
+        self._sensors = []
+        self._actuators = []
+        for room_name in self.room_names:
+            self._sensors.append(
+                tuple(
+                    getattr(devices.get(room_name, device_type), "status", None)
+                    for device_type in [
+                        DeviceType.TEMP_SENSOR,
+                        DeviceType.HUMIDITY_SENSOR,
+                        DeviceType.LIGHT_SENSOR,
+                    ]
+                )
+            )
+            self._actuators.append(
+                tuple(
+                    getattr(devices.get(room_name, device_type), "status", None)
+                    for device_type in [
+                        DeviceType.LIGHT,
+                        DeviceType.CURTAIN,
+                        DeviceType.WINDOW,
+                        DeviceType.AC,
+                        DeviceType.CLIMATE,
+                    ]
+                )
+            )
+
+        self.has_sensor = np.array(
+            [[status is not None for status in sensors] for sensors in self._sensors],
+            dtype=bool,
+        ).reshape(n, 3)
+        self._dirty_rooms = set()
+        self.sensors_dirty = False
+        self.load_sensors()
+        self.load_actuators()
+
+    def load_sensors(self):
+        """Считывает показания датчиков из модели House в массивы"""
+        for i, (temp, humidity, light) in enumerate(self._sensors):
+            self.temperature[i] = temp["temperature"] if temp else 22.0
+            self.humidity[i] = humidity["humidity"] if humidity else 50.0
+            self.light_level[i] = light["light_level"] if light else 0.0
+        self.sensors_dirty = False
+
+    def load_actuators(self):
+        """Считывает настройки всех исполнительных устройств из модели House"""
+        for i in range(len(self.room_names)):
+            self._load_room_actuators(i)
+        self._dirty_rooms.clear()
+
+    def mark_actuators_dirty(self, room_name: str):
+        """Помечает комнату для перечитывания настроек перед следующим шагом"""
+        self._dirty_rooms.add(self.room_index[room_name])
+
+    def _load_room_actuators(self, i: int):
+        light, curtain, window, ac, climate = self._actuators[i]
+        self.brightness[i] = light["brightness"] if light else 0.0
+        self.curtain_open[i] = curtain["open_percent"] / 100.0 if curtain else 0.0
+        self.window_open[i] = window["open_percent"] / 100.0 if window else 0.0
+        self.has_opening[i] = curtain is not None and window is not None
+        self.ac_power[i] = bool(ac and ac["power"])
+        self.ac_target[i] = ac["target_temp"] if ac else 0.0
+        self.ac_intensity[i] = ac["intensity"] / 100.0 if ac else 0.0
+        self.climate_power[i] = bool(climate and climate["power"])
+        self.climate_target[i] = climate["target_humidity"] if climate else 0.0
+        self.climate_intensity[i] = climate["intensity"] / 100.0 if climate else 0.0
+
+    def step(self, environment: dict, elapsed_time: float):
+        """Продвигает все комнаты на elapsed_time минут одним векторным шагом"""
+        if self._dirty_rooms:
+            for i in self._dirty_rooms:
+                self._load_room_actuators(i)
+            self._dirty_rooms.clear()
+
+        self.temperature = self.update_temperature(
+            self.temperature,
+            environment["outside_temp"],
+            self.window_open,
+            self.ac_power,
+            self.ac_target,
+            self.ac_intensity,
+            elapsed_time,
+        )
+        self.humidity = self.update_humidity(
+            self.humidity,
+            environment["outside_humidity"],
+            self.window_open,
+            self.climate_power,
+            self.climate_target,
+            self.climate_intensity,
+            elapsed_time,
+        )
+        self.light_level = light_level(
+            environment["outside_light"],
+            self.brightness,
+            self.curtain_open,
+            self.window_open,
+            self.has_opening,
+        )
+        self.sensors_dirty = True
+
+    def sensor_readings(self):
+        """Показания датчиков по комнатам; для отсутствующих датчиков - 0"""
+        return (
+            np.where(self.has_sensor[:, 0], self.temperature, 0.0),
+            np.where(self.has_sensor[:, 1], self.humidity, 0.0),
+            np.where(self.has_sensor[:, 2], self.light_level, 0.0),
+        )
+
+    def sync_house(self) -> House:
+        """Записывает текущие показания из массивов обратно в модель House"""
+        if self.sensors_dirty:
+            temperature = self.temperature.tolist()
+            humidity_values = self.humidity.tolist()
+            light_levels = self.light_level.tolist()
+            for i, (temp, humidity, light) in enumerate(self._sensors):
+                if temp:
+                    temp["temperature"] = temperature[i]
+                if humidity:
+                    humidity["humidity"] = humidity_values[i]
+                if light:
+                    light["light_level"] = light_levels[i]
+            self.sensors_dirty = False
+        return self.house
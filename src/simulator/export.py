@@ -0,0 +1,189 @@
+import gzip
+import json
+import os
+import struct
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .reports import PARQUET_REPORT, report_rooms
+from .sensor_log import METRICS, MINUTES_PER_DAY, SensorLog
+
+EXPORT_FORMATS = ("arrow", "f32")
+EXPORT_COMPRESSIONS = ("none", "gzip", "zstd")
+EXPORT_MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "f32": "application/octet-stream",
+}
+
+# Заголовок формата f32: сигнатура, версия и длина JSON-описания (little-endian)
+F32_MAGIC = b"SHF32"
+F32_VERSION = 1
+_F32_PREFIX = struct.Struct("<5sBI")
+
+
+class SensorDay(NamedTuple):
+    """Показания датчиков за день в столбцовом виде: абсолютные минуты
+    симуляции (n,) и значения (метрика, комната, n); пропуски - NaN"""
+
+    day_id: str
+    rooms: List[str]
+    minutes: np.ndarray
+    values: np.ndarray
+
+
+def _first_minute(day: int) -> int:
+    """Абсолютная минута начала дня отчёта (дни отчётов нумеруются с 1)"""
+    return max(day - 1, 0) * MINUTES_PER_DAY
+
+
+def _align(day_id: str, day: int, frames: Dict[str, pd.DataFrame]) -> SensorDay:
+    """Сводит таблицы комнат на общую шкалу времени"""
+    rooms = list(frames)
+    times = np.unique(
+        np.concatenate(
+            [df["time_minutes"].to_numpy(np.int32) for df in frames.values()]
+            or [np.empty(0, np.int32)]
+        )
+    )
+    values = np.full((len(METRICS), len(rooms), len(times)), np.nan, np.float32)
+    for r, df in enumerate(frames.values()):
+        rows = np.searchsorted(times, df["time_minutes"].to_numpy(np.int32))
+        for m, metric in enumerate(METRICS):
+            values[m, r, rows] = df[metric].to_numpy(np.float32)
+    return SensorDay(day_id, rooms, times + _first_minute(day), values)
+
+
+def read_report_day(report_dir: str, day: int) -> SensorDay:
+    """Показания за день из сохранённого отчёта (Parquet или CSV комнат)"""
+    day_id = os.path.basename(report_dir)
+    columns = ["time_minutes", *METRICS]
+    parquet_path = os.path.join(report_dir, PARQUET_REPORT)
+    if os.path.exists(parquet_path):
+        df = pd.read_parquet(parquet_path, columns=["room", *columns])
+        frames = {
+            str(room_name): room_df
+            for room_name, room_df in df.groupby("room", observed=True, sort=False)
+        }
+    else:
+        frames = {
+            room_name: pd.read_csv(
+                os.path.join(report_dir, f"{room_name}_data.csv"), usecols=columns
+            )
+            for room_name in report_rooms(report_dir)
+        }
+    return _align(day_id, day, frames)
+
+
+def sensor_log_day(day_id: str, day: int, sensor_log: SensorLog) -> SensorDay:
+    """Показания текущего дня из буфера симулятора (без чтения файлов)"""
+    values = np.stack([sensor_log.metric(metric) for metric in METRICS])
+    minutes = sensor_log.times().astype(np.int32) + _first_minute(day)
+    return SensorDay(
+        day_id, list(sensor_log.room_names), minutes, values.astype(np.float32)
+    )
+
+
+def combine_days(days: List[SensorDay]) -> SensorDay:
+    """Склеивает дни по времени; набор комнат - объединение комнат всех дней"""
+    rooms: List[str] = []
+    for day in days:
+        rooms.extend(room for room in day.rooms if room not in rooms)
+    index = {room: i for i, room in enumerate(rooms)}
+
+    size = sum(len(day.minutes) for day in days)
+    minutes = np.empty(size, np.int32)
+    values = np.full((len(METRICS), len(rooms), size), np.nan, np.float32)
+    start = 0
+    for day in days:
+        end = start + len(day.minutes)
+        minutes[start:end] = day.minutes
+        values[:, [index[room] for room in day.rooms], start:end] = day.values
+        start = end
+    return SensorDay(",".join(day.day_id for day in days), rooms, minutes, values)
+
+
+def _describe(data: SensorDay, day_ids: List[str]) -> Dict:
+    return {
+        "days": day_ids,
+        "rooms": data.rooms,
+        "metrics": list(METRICS),
+        "rows": len(data.minutes),
+    }
+
+
+def encode_f32(data: SensorDay, day_ids: List[str]) -> bytes:
+    """Формат f32: заголовок и сырые little-endian массивы.
+
+    Заголовок - сигнатура SHF32, байт версии, uint32 длины JSON-описания и само
+    описание, дополненное пробелами до кратной 8 длины. За ним массив минут
+    int32 (rows,) и массив значений float32 (metrics, rooms, rows); оба
+    выровнены на 4 байта, так что читаются без копирования
+    (np.frombuffer, Float32Array)"""
+    description = _describe(data, day_ids)
+    description["arrays"] = [
+        {"name": "minute", "dtype": "<i4", "shape": [len(data.minutes)]},
+        {"name": "values", "dtype": "<f4", "shape": list(data.values.shape)},
+    ]
+    header = json.dumps(description).encode()
+    header += b" " * (-(_F32_PREFIX.size + len(header)) % 8)
+    return b"".join(
+        (
+            _F32_PREFIX.pack(F32_MAGIC, F32_VERSION, len(header)),
+            header,
+            data.minutes.astype("<i4").tobytes(),
+            data.values.astype("<f4").tobytes(),
+        )
+    )
+
+
+def encode_arrow(data: SensorDay, day_ids: List[str]) -> bytes:
+    """Формат arrow: поток Arrow IPC со столбцами minute (int32, абсолютная
+    минута симуляции), room (словарь) и метриками float32, строки по
+    комнатам; строки комнат без показаний пропускаются. Схема своя, не как у
+    Parquet-отчётов (там time_minutes от начала дня и float64)"""
+    import pyarrow as pa
+
+    rooms, rows = data.rooms, len(data.minutes)
+    present = ~np.isnan(data.values).all(axis=0)
+    room_index = np.repeat(np.arange(len(rooms), dtype=np.int32), rows)[present.ravel()]
+    columns = {
+        "minute": pa.array(np.tile(data.minutes, len(rooms))[present.ravel()]),
+        "room": pa.DictionaryArray.from_arrays(room_index, pa.array(rooms)),
+    }
+    for m, metric in enumerate(METRICS):
+        columns[metric] = pa.array(data.values[m][present])
+
+    metadata = {
+        key: json.dumps(value)
+        for key, value in _describe(data, day_ids).items()
+        if key != "rows"
+    }
+    table = pa.table(columns).replace_schema_metadata(metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def compress(body: bytes, compression: str) -> Tuple[bytes, Optional[str]]:
+    """Сжимает тело ответа; возвращает его и значение Content-Encoding"""
+    if compression == "gzip":
+        return gzip.compress(body, compresslevel=6), "gzip"
+    if compression == "zstd":
+        import pyarrow as pa
+
+        return pa.compress(body, codec="zstd", asbytes=True), "zstd"
+    return body, None
+
+
+def export_sensor_data(
+    days: List[SensorDay], export_format: str = "arrow", compression: str = "none"
+) -> Tuple[bytes, Optional[str]]:
+    """Кодирует показания дней в формат выгрузки и сжимает их"""
+    data = combine_days(days)
+    day_ids = [day.day_id for day in days]
+    if export_format == "f32":
+        body = encode_f32(data, day_ids)
+    else:
+        body = encode_arrow(data, day_ids)
+    return compress(body, compression)
@@ -0,0 +1,299 @@
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from .rollups import ROLLUP_RESOLUTIONS, STATS, RollupRow
+from .sensor_log import METRICS
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rooms (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run INTEGER NOT NULL,
+    room INTEGER NOT NULL,
+    minute INTEGER NOT NULL,
+    temperature REAL,
+    humidity REAL,
+    light REAL,
+    PRIMARY KEY (run, room, minute)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollups (
+    run INTEGER NOT NULL,
+    resolution INTEGER NOT NULL,
+    room INTEGER NOT NULL,
+    minute INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    temperature_min REAL,
+    temperature_mean REAL,
+    temperature_max REAL,
+    humidity_min REAL,
+    humidity_mean REAL,
+    humidity_max REAL,
+    light_min REAL,
+    light_mean REAL,
+    light_max REAL,
+    PRIMARY KEY (run, resolution, room, minute)
+) WITHOUT ROWID;
+"""
+
+
+class HistoryStore:
+    """Постоянное хранилище истории показаний датчиков на SQLite.
+
+    Строки пишутся каждый тик с ключом (запуск, комната, абсолютная минута
+    симуляции), поэтому запрос диапазона по комнате идёт по первичному ключу без
+    сканирования каталогов отчётов. Абсолютная минута начинается с нуля при
+    каждом запуске, поэтому каждый экземпляр хранилища при первой записи
+    открывает новый запуск (run), и история прошлых запусков не
+    перезаписывается; экземпляр без записей запусков не добавляет. Транзакция
+    фиксируется раз в commit_every тиков; запросы выполняются на том же
+    соединении и видят ещё не зафиксированные строки.
+    """
+
+    def __init__(self, path: str, commit_every: int = 60):
+        self.path = path
+        self.commit_every = commit_every
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self._conn.executescript(SCHEMA)
+        self._room_ids: Dict[str, int] = dict(
+            self._conn.execute("SELECT name, id FROM rooms")
+        )
+        # Текущий запуск; создаётся при первой записи
+        self.run: Optional[int] = None
+        self._pending = 0
+        self._last_minute: Optional[int] = None
+        logger.info(f"History store {path} opened")
+
+    def _start_run(self) -> int:
+        cursor = self._conn.execute(
+            "INSERT INTO runs (started_at) VALUES (?)", (datetime.now().isoformat(),)
+        )
+        self._conn.commit()
+        return cursor.lastrowid
+
+    def _current_run(self) -> int:
+        if self.run is None:
+            self.run = self._start_run()
+            logger.info(f"History run {self.run} started in {self.path}")
+        return self.run
+
+    def _migrate(self):
+        """Переносит историю из схемы без запусков в отдельный запуск"""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(samples)")]
+        if not columns or "run" in columns:
+            return
+
+        tables = ("samples", "rollups")
+        for table in tables:
+            self._conn.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+        self._conn.executescript(SCHEMA)
+        run = self._start_run()
+        for table in tables:
+            legacy_columns = [
+                row[1]
+                for row in self._conn.execute(f"PRAGMA table_info({table}_legacy)")
+            ]
+            self._conn.execute(
+                f"INSERT INTO {table} (run, {', '.join(legacy_columns)}) "
+                f"SELECT ?, {', '.join(legacy_columns)} FROM {table}_legacy",
+                (run,),
+            )
+            self._conn.execute(f"DROP TABLE {table}_legacy")
+        self._conn.commit()
+        logger.info(f"History from before runs were recorded moved to run {run}")
+
+    def _room_id(self, room_name: str) -> int:
+        room_id = self._room_ids.get(room_name)
+        if room_id is None:
+            cursor = self._conn.execute(
+                "INSERT INTO rooms (name) VALUES (?)", (room_name,)
+            )
+            room_id = self._room_ids[room_name] = cursor.lastrowid
+        return room_id
+
+    def append(
+        self, minute: int, room_names: Iterable[str], temperature, humidity, light
+    ):
+        """Добавляет показания всех комнат за одну минуту симуляции. При шаге
+        меньше минуты сохраняется первое показание минуты"""
+        with self._lock:
+            if minute == self._last_minute:
+                return
+            self._last_minute = minute
+            run = self._current_run()
+            room_ids = [self._room_id(room_name) for room_name in room_names]
+            self._conn.executemany(
+                "INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?)",
+                zip(
+                    [run] * len(room_ids),
+                    room_ids,
+                    [minute] * len(room_ids),
+                    list(temperature),
+                    list(humidity),
+                    list(light),
+                ),
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._conn.commit()
+                self._pending = 0
+
+    def append_rollups(self, room_names: List[str], rows: List[RollupRow]):
+        """Сохраняет закрытые интервалы агрегатов (см. Rollups)"""
+        with self._lock:
+            run = self._current_run()
+            room_ids = [self._room_id(room_name) for room_name in room_names]
+            records = []
+            for name, minute, count, stats in rows:
+                # (метрика, статистика, комната) -> строка на комнату
+                values = stats.reshape(-1, len(room_ids)).T.tolist()
+                resolution = ROLLUP_RESOLUTIONS[name]
+                for room_id, room_values in zip(room_ids, values):
+                    records.append(
+                        (run, resolution, room_id, minute, count, *room_values)
+                    )
+            self._conn.executemany(
+                "INSERT INTO rollups VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                records,
+            )
+
+    def query(
+        self,
+        room_name: str,
+        metric: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        resolution: int = 1,
+        run: Optional[int] = None,
+    ) -> Optional[Dict]:
+        """Значения метрики комнаты на отрезке [start, end] абсолютных минут
+        запуска run (по умолчанию текущего), усреднённые по интервалам
+        resolution минут. None, если комнаты нет"""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+
+        with self._lock:
+            room_id = self._room_ids.get(room_name)
+            if room_id is None:
+                return None
+            rows = self._conn.execute(
+                f"SELECT (minute / ?) * ? AS bucket, AVG({metric}) FROM samples "
+                "WHERE run = ? AND room = ? AND minute BETWEEN ? AND ? "
+                "GROUP BY bucket ORDER BY bucket",
+                (
+                    resolution,
+                    resolution,
+                    self.run if run is None else run,
+                    room_id,
+                    start if start is not None else -(2**62),
+                    end if end is not None else 2**62,
+                ),
+            ).fetchall()
+
+        return {
+            "run": self.run if run is None else run,
+            "room": room_name,
+            "metric": metric,
+            "resolution": resolution,
+            "minutes": [row[0] for row in rows],
+            "values": [row[1] for row in rows],
+        }
+
+    def query_rollups(
+        self,
+        room_name: str,
+        metric: str,
+        resolution: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        run: Optional[int] = None,
+    ) -> Optional[Dict]:
+        """Агрегаты min/mean/max метрики комнаты за интервалы разрешения
+        resolution ("15min", "hour", "day"), начинающиеся в [start, end],
+        в запуске run (по умолчанию текущем)"""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        if resolution not in ROLLUP_RESOLUTIONS:
+            raise ValueError(f"Unknown rollup resolution: {resolution}")
+
+        columns = ", ".join(f"{metric}_{stat}" for stat in STATS)
+        with self._lock:
+            room_id = self._room_ids.get(room_name)
+            if room_id is None:
+                return None
+            rows = self._conn.execute(
+                f"SELECT minute, count, {columns} FROM rollups "
+                "WHERE run = ? AND resolution = ? AND room = ? "
+                "AND minute BETWEEN ? AND ? ORDER BY minute",
+                (
+                    self.run if run is None else run,
+                    ROLLUP_RESOLUTIONS[resolution],
+                    room_id,
+                    start if start is not None else -(2**62),
+                    end if end is not None else 2**62,
+                ),
+            ).fetchall()
+
+        history = {
+            "run": self.run if run is None else run,
+            "room": room_name,
+            "metric": metric,
+            "resolution": resolution,
+            "minutes": [row[0] for row in rows],
+            "count": [row[1] for row in rows],
+        }
+        for i, stat in enumerate(STATS):
+            history[stat] = [row[2 + i] for row in rows]
+        return history
+
+    def runs(self) -> List[Dict]:
+        """Запуски, история которых есть в хранилище, от первых к последним"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, started_at FROM runs ORDER BY id"
+            ).fetchall()
+        return [
+            {"run": run, "started_at": started_at, "current": run == self.run}
+            for run, started_at in rows
+        ]
+
+    def truncate(self, start: int, rollups_from: Dict[str, int]):
+        """Удаляет записи текущего запуска, которые будут записаны заново после
+        отката к контрольной точке: показания с минуты start и агрегаты,
+        начинающиеся не раньше rollups_from[разрешение]"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM samples WHERE run = ? AND minute >= ?", (self.run, start)
+            )
+            for name, minute in rollups_from.items():
+                self._conn.execute(
+                    "DELETE FROM rollups "
+                    "WHERE run = ? AND resolution = ? AND minute >= ?",
+                    (self.run, ROLLUP_RESOLUTIONS[name], minute),
+                )
+            self._conn.commit()
+            self._pending = 0
+            self._last_minute = None
+
+    def flush(self):
+        """Фиксирует накопленные записи на диске"""
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
@@ -0,0 +1,116 @@
+from bisect import bisect_left
+from typing import Dict
+
+BUCKETS = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Histogram:
+    """Гистограмма длительностей с фиксированными границами корзин"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class TickMetrics:
+    """Метрики цикла симуляции: длительности фаз тика, фактическая и целевая
+    частота тиков и накопленное отставание от реального времени"""
+
+    PHASES = [
+        "tick",
+        "log_sensor_data",
+        "update_environment",
+        "update_rooms",
+        "day_rollover",
+        "generate_reports",
+    ]
+
+    def __init__(self):
+        self.phases: Dict[str, Histogram] = {
+            phase: Histogram() for phase in self.PHASES
+        }
+        self.ticks = 0
+        self.tick_rate = 0.0
+        self.target_rate = 0.0
+        self.lag_seconds = 0.0
+
+    def observe(self, phase: str, seconds: float):
+        self.phases[phase].observe(seconds)
+
+    def observe_interval(self, interval: float, expected: float):
+        """Учитывает реальный интервал между тиками цикла реального времени"""
+        self.ticks += 1
+        if interval > 0:
+            rate = 1.0 / interval
+            # Экспоненциальное сглаживание примерно по последним 20 тикам
+            self.tick_rate = (
+                rate if self.tick_rate == 0 else (0.95 * self.tick_rate + 0.05 * rate)
+            )
+        self.target_rate = 1.0 / expected if expected > 0 else 0.0
+        self.lag_seconds = max(0.0, self.lag_seconds + interval - expected)
+
+    def render(self) -> str:
+        """Формирует метрики в текстовом формате Prometheus"""
+        lines = [
+            "# HELP smart_home_tick_phase_seconds Duration of simulation tick phases",
+            "# TYPE smart_home_tick_phase_seconds histogram",
+        ]
+        for phase, histogram in self.phases.items():
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(
+                    f'smart_home_tick_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f'smart_home_tick_phase_seconds_bucket{{phase="{phase}",le="+Inf"}} {histogram.count}'
+            )
+            lines.append(
+                f'smart_home_tick_phase_seconds_sum{{phase="{phase}"}} {histogram.sum}'
+            )
+            lines.append(
+                f'smart_home_tick_phase_seconds_count{{phase="{phase}"}} {histogram.count}'
+            )
+
+        lines += [
+            "# HELP smart_home_realtime_ticks_total Ticks executed by the realtime loop",
+            "# TYPE smart_home_realtime_ticks_total counter",
+            f"smart_home_realtime_ticks_total {self.ticks}",
+            "# HELP smart_home_tick_rate Measured realtime ticks per second",
+            "# TYPE smart_home_tick_rate gauge",
+            f"smart_home_tick_rate {self.tick_rate}",
+            "# HELP smart_home_tick_target_rate Ticks per second required by the simulation speed",
+            "# TYPE smart_home_tick_target_rate gauge",
+            f"smart_home_tick_target_rate {self.target_rate}",
+            "# HELP smart_home_tick_lag_seconds Accumulated delay behind wall-clock target",
+            "# TYPE smart_home_tick_lag_seconds gauge",
+            f"smart_home_tick_lag_seconds {self.lag_seconds}",
+        ]
+        return "\n".join(lines) + "\n"
@@ -1,6 +1,6 @@
 from enum import Enum
 from pydantic import BaseModel
-from typing import Dict
+from typing import Dict, List
 
 
 class DeviceType(str, Enum):
@@ -29,7 +29,7 @@ class DeviceStatus(BaseModel):
 
 
 class Room(BaseModel):
-    type: RoomType
+    type: str
     devices: Dict[str, DeviceStatus]
 
 
@@ -40,7 +40,7 @@ class WeatherType(str, Enum):
 
 
 class House(BaseModel):
-    rooms: Dict[RoomType, Room]
+    rooms: Dict[str, Room]
     environment: Dict[str, float]
     time_of_day: float
     time_minutes: int = 0
@@ -50,6 +50,11 @@ class House(BaseModel):
 
 
 class DeviceUpdateRequest(BaseModel):
-    room: RoomType
+    room: str
     device_id: str
     status: Dict
+
+
+class DeviceBatchUpdateRequest(BaseModel):
+    updates: List[DeviceUpdateRequest]
+    atomic: bool = False
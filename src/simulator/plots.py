@@ -0,0 +1,212 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import matplotlib.pyplot as plt
+import pandas as pd
+from .reports import PARQUET_REPORT, read_parquet_report, report_rooms
+from .sensor_log import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Заголовок графика комнаты, подпись оси и заголовок сравнительного графика
+PLOT_LABELS = {
+    "temperature": (
+        "Temperature",
+        "Temperature (°C)",
+        "Temperature Comparison Between Rooms",
+    ),
+    "humidity": ("Humidity", "Humidity (%)", "Humidity Comparison Between Rooms"),
+    "light": ("Light level", "Light level (%)", "Light Level Comparison Between Rooms"),
+}
+
+# pyplot хранит глобальное состояние, поэтому графики строятся по одному
+_plot_lock = threading.Lock()
+
+
+def _data_mtime(report_dir: str) -> float:
+    """Время последнего изменения данных отчёта (день может ещё записываться)"""
+    return max(
+        (
+            entry.stat().st_mtime
+            for entry in os.scandir(report_dir)
+            if entry.name.endswith((".csv", ".parquet"))
+        ),
+        default=0.0,
+    )
+
+
+def _inside(root: str, path: str) -> bool:
+    """Лежит ли path внутри каталога root (с учётом символических ссылок)"""
+    root = os.path.realpath(root)
+    return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+
+def _plain_name(name: str) -> bool:
+    return name not in ("", ".", "..") and os.path.basename(name) == name
+
+
+def _plot_targets(room_names: List[str]) -> Dict[str, Tuple[Optional[str], str]]:
+    """Имя файла графика -> (комната или None для сравнительного, метрика)"""
+    targets = {}
+    for room_name in room_names:
+        for metric in METRICS:
+            targets[f"{room_name}_{metric}.png"] = (room_name, metric)
+    for metric in METRICS:
+        targets[f"{metric}_comparison.png"] = (None, metric)
+    return targets
+
+
+def plot_names(room_names: List[str]) -> List[str]:
+    """Имена всех графиков, которые можно построить для отчёта за день"""
+    return list(_plot_targets(room_names))
+
+
+def _load_day(report_dir: str, room_names: List[str]) -> Dict[str, pd.DataFrame]:
+    parquet_path = os.path.join(report_dir, PARQUET_REPORT)
+    if os.path.exists(parquet_path):
+        return read_parquet_report(parquet_path)
+    return {
+        room_name: pd.read_csv(os.path.join(report_dir, f"{room_name}_data.csv"))
+        for room_name in room_names
+    }
+
+
+def render_plot(report_dir: str, file_name: str, out_path: str) -> bool:
+    """Строит один график отчёта за день по его данным. False, если такого
+    графика у отчёта нет"""
+    rooms = report_rooms(report_dir)
+    target = _plot_targets(rooms).get(file_name)
+    if target is None:
+        return False
+
+    room_name, metric = target
+    title, ylabel, comparison_title = PLOT_LABELS[metric]
+    data = _load_day(report_dir, rooms if room_name is None else [room_name])
+
+    with _plot_lock:
+        if room_name is not None:
+            room_data = data[room_name]
+            plt.figure(figsize=(10, 6))
+            plt.plot(room_data["time_minutes"] / 60, room_data[metric])
+            plt.title(f"{title} in {room_name}")
+        else:
+            plt.figure(figsize=(12, 7))
+            for name in rooms:
+                room_data = data[name]
+                plt.plot(room_data["time_minutes"] / 60, room_data[metric], label=name)
+            plt.title(comparison_title)
+            plt.legend()
+        plt.xlabel("Time (hours)")
+        plt.ylabel(ylabel)
+        plt.grid(True)
+        plt.savefig(out_path)
+        plt.close()
+
+    return True
+
+
+class PlotCache:
+    """Дисковый кэш графиков отчётов, строящихся при первом запросе.
+
+    Графики хранятся в cache_dir/<day_id>/<file_name>. Когда суммарный размер
+    превышает max_bytes, удаляются графики, которые дольше всего не запрашивались.
+    """
+
+    def __init__(
+        self,
+        reports_dir: str = "reports",
+        cache_dir: str = "plot_cache",
+        max_bytes: int = 256 * 2**20,
+    ):
+        self.reports_dir = reports_dir
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        files = []
+        for day_id in os.listdir(cache_dir):
+            day_path = os.path.join(cache_dir, day_id)
+            if not os.path.isdir(day_path):
+                continue
+            for file_name in os.listdir(day_path):
+                if file_name.endswith(".tmp.png"):
+                    # Недописанный график после аварийной остановки
+                    os.remove(os.path.join(day_path, file_name))
+                    continue
+                stat = os.stat(os.path.join(day_path, file_name))
+                files.append((stat.st_atime, f"{day_id}/{file_name}", stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._size += size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, *key.split("/"))
+
+    def is_rendered(self, day_id: str, file_name: str) -> bool:
+        return f"{day_id}/{file_name}" in self._entries
+
+    def get(self, day_id: str, file_name: str) -> Optional[str]:
+        """Путь к графику, построенному при необходимости. None, если у отчёта
+        такого графика нет или имена выходят за каталоги отчётов и кэша"""
+        if not (_plain_name(day_id) and _plain_name(file_name)):
+            return None
+        key = f"{day_id}/{file_name}"
+        path = self._path(key)
+
+        report_dir = os.path.join(self.reports_dir, day_id)
+        if not (
+            _inside(self.reports_dir, report_dir) and _inside(self.cache_dir, path)
+        ):
+            return None
+        if not os.path.isdir(report_dir):
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                # График устарел, если данные дня дописывались после построения
+                rendered = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+                if rendered and rendered / 1e9 >= _data_mtime(report_dir):
+                    self._entries.move_to_end(key)
+                    # Время доступа хранит порядок LRU между перезапусками;
+                    # время изменения остаётся временем построения (для ETag)
+                    os.utime(path, ns=(time.time_ns(), rendered))
+                    return path
+                self._size -= self._entries.pop(key)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Свой временный файл на каждое построение: одновременные первые
+        # запросы одного графика не мешают друг другу
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp.png", dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            if not render_plot(report_dir, file_name, tmp_path):
+                return None
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        logger.info(f"Rendered report plot {key}")
+
+        with self._lock:
+            size = os.path.getsize(path)
+            self._size += size - self._entries.get(key, 0)
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            self._evict()
+        return path
+
+    def _evict(self):
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
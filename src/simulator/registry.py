@@ -0,0 +1,63 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from .models import House, DeviceType, DeviceStatus, RoomType
+
+SENSOR_TYPES = {
+    DeviceType.TEMP_SENSOR,
+    DeviceType.HUMIDITY_SENSOR,
+    DeviceType.LIGHT_SENSOR,
+    DeviceType.MOTION_SENSOR,
+}
+
+
+class DeviceRegistry:
+    """Реестр устройств дома с заранее построенными индексами: по id, по комнате,
+    по типу устройства и по классу (датчики / исполнительные устройства)"""
+
+    def __init__(self, house: House):
+        self.rebuild(house)
+
+    def rebuild(self, house: House):
+        """Перестраивает индексы после замены модели дома"""
+        self.house = house
+        self.by_id: Dict[str, Tuple[RoomType, DeviceStatus]] = {}
+        self.by_room: Dict[RoomType, List[DeviceStatus]] = {}
+        self.by_type: Dict[DeviceType, List[Tuple[RoomType, DeviceStatus]]] = (
+            defaultdict(list)
+        )
+        self.sensors: List[Tuple[RoomType, DeviceStatus]] = []
+        self.actuators: List[Tuple[RoomType, DeviceStatus]] = []
+        self._by_room_type: Dict[Tuple[RoomType, DeviceType], DeviceStatus] = {}
+
+        for room_type, room in house.rooms.items():
+            self.by_room[room_type] = list(room.devices.values())
+            for device_id, device in room.devices.items():
+                device_type = DeviceType(device.type)
+                self.by_id[device_id] = (room_type, device)
+                self.by_type[device_type].append((room_type, device))
+                self._by_room_type.setdefault((room_type, device_type), device)
+                if device_type in SENSOR_TYPES:
+                    self.sensors.append((room_type, device))
+                else:
+                    self.actuators.append((room_type, device))
+
+    def get(
+        self, room_type: RoomType, device_type: DeviceType
+    ) -> Optional[DeviceStatus]:
+        """Возвращает устройство заданного типа в комнате или None"""
+        return self._by_room_type.get((room_type, device_type))
+
+    def device_id(self, room_type: RoomType, device_type: DeviceType) -> Optional[str]:
+        """Возвращает id устройства заданного типа в комнате или None"""
+        device = self._by_room_type.get((room_type, device_type))
+        return device.id if device else None
+
+    def room_of(self, device_id: str) -> Optional[RoomType]:
+        """Возвращает комнату, в которой находится устройство"""
+        entry = self.by_id.get(device_id)
+        return entry[0] if entry else None
+
+    def is_sensor(self, device_id: str) -> bool:
+        """Проверяет, является ли устройство датчиком"""
+        entry = self.by_id.get(device_id)
+        return entry is not None and entry[1].type in SENSOR_TYPES
@@ -0,0 +1,353 @@
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import pandas as pd
+from .rollups import RollupRow, rollups_frame
+from .sensor_log import METRICS, SensorLog
+
+logger = logging.getLogger(__name__)
+
+REPORT_FORMATS = ("csv", "parquet")
+PARQUET_REPORT = "sensor_data.parquet"
+JOURNAL_REPORT = "sensor_data.partial.csv"
+ROLLUPS_REPORTS = {"csv": "rollups.csv", "parquet": "rollups.parquet"}
+
+
+# Способ запуска процесса отчётов; fork небезопасен в многопоточном сервере
+WORKER_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+FSYNC_POLICIES = ("none", "flush", "close")
+CSV_HEADER = "time,time_minutes,temperature,humidity,light\n"
+JOURNAL_HEADER = "room,time_minutes,temperature,humidity,light\n"
+
+
+class ReportStreamWriter:
+    """Потоковая запись данных отчёта за день по мере работы симулятора.
+
+    write() дописывает в файлы строки лога датчиков, которые ещё не были
+    записаны. В формате CSV это сами CSV-файлы комнат. Для Parquet строки
+    копятся в журнале sensor_data.partial.csv, а в Parquet их переводит
+    finalize_day_report. Каждый сброс - один системный вызов write на файл
+    без пользовательского буфера, поэтому после аварии файлы обрываются на
+    последнем сброшенном блоке и остаются читаемыми. Политика fsync: "none" -
+    никогда, "flush" - после каждого сброса, "close" - при закрытии дня.
+    """
+
+    def __init__(
+        self,
+        report_dir: str,
+        room_names: List[str],
+        report_format: str = "csv",
+        fsync: str = "close",
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.report_dir = report_dir
+        self.room_names = list(room_names)
+        self.report_format = report_format
+        self.fsync = fsync
+        self.rows_written = 0
+
+        os.makedirs(report_dir, exist_ok=True)
+        if report_format == "parquet":
+            paths = {None: f"{report_dir}/{JOURNAL_REPORT}"}
+            header = JOURNAL_HEADER
+        else:
+            paths = {
+                room_name: f"{report_dir}/{room_name}_data.csv"
+                for room_name in self.room_names
+            }
+            header = CSV_HEADER
+        self._files = {}
+        for key, path in paths.items():
+            f = open(path, "wb", buffering=0)
+            f.write(header.encode())
+            self._files[key] = f
+
+    def write(self, sensor_log: SensorLog):
+        """Дописывает строки лога, появившиеся после предыдущего сброса"""
+        size = len(sensor_log)
+        if size <= self.rows_written:
+            return
+
+        rows = slice(self.rows_written, size)
+        times = sensor_log.times()[rows].tolist()
+        temperature, humidity, light = (
+            sensor_log.metric(metric)[:, rows].tolist() for metric in METRICS
+        )
+
+        if self.report_format == "parquet":
+            lines = [
+                f"{room_name},{t},{temperature[r][i]!r},{humidity[r][i]!r},"
+                f"{light[r][i]!r}\n"
+                for i, t in enumerate(times)
+                for r, room_name in enumerate(self.room_names)
+            ]
+            self._write(self._files[None], lines)
+        else:
+            for r, room_name in enumerate(self.room_names):
+                lines = [
+                    f"{t//60:02d}:{t%60:02d},{t},{temperature[r][i]!r},"
+                    f"{humidity[r][i]!r},{light[r][i]!r}\n"
+                    for i, t in enumerate(times)
+                ]
+                self._write(self._files[room_name], lines)
+
+        self.rows_written = size
+
+    def _write(self, f, lines: List[str]):
+        f.write("".join(lines).encode())
+        if self.fsync == "flush":
+            os.fsync(f.fileno())
+
+    def close(self):
+        """Закрывает файлы дня (с fsync, если он не отключён)"""
+        for f in self._files.values():
+            if self.fsync != "none":
+                os.fsync(f.fileno())
+            f.close()
+        self._files = {}
+
+
+def finalize_day_report(
+    report_dir: str,
+    report_format: str = "csv",
+    day: int = 0,
+    room_names: Optional[List[str]] = None,
+    rollups: Optional[List[RollupRow]] = None,
+) -> Dict:
+    """Завершает отчёт за день: переводит журнал в Parquet и записывает
+    агрегаты. Графики строятся позже, при первом запросе (см. plots.PlotCache)"""
+    started = time.perf_counter()
+
+    journal_path = f"{report_dir}/{JOURNAL_REPORT}"
+    if report_format == "parquet" and os.path.exists(journal_path):
+        df = pd.read_csv(journal_path, dtype={"room": str})
+        if room_names is None:
+            room_names = list(pd.unique(df["room"]))
+        df["room"] = pd.Categorical(df["room"], categories=room_names)
+        df = df.sort_values("room", kind="stable").reset_index(drop=True)
+        _write_parquet(f"{report_dir}/{PARQUET_REPORT}", df, day, room_names)
+        os.remove(journal_path)
+
+    if rollups:
+        df = rollups_frame(rollups, room_names)
+        path = f"{report_dir}/{ROLLUPS_REPORTS[report_format]}"
+        if report_format == "parquet":
+            df.to_parquet(path, compression="zstd", index=False)
+        else:
+            df.to_csv(path, index=False)
+        logger.info(f"Rollups saved to {path}")
+
+    return {"elapsed_seconds": time.perf_counter() - started}
+
+
+def _write_parquet(path: str, df: pd.DataFrame, day: int, room_names: List[str]):
+    """Записывает данные всех комнат за день в один сжатый Parquet-файл"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {
+            **table.schema.metadata,
+            b"day": str(day),
+            b"rooms": json.dumps(room_names),
+            b"generated_at": datetime.now().isoformat(),
+        }
+    )
+    pq.write_table(table, path, compression="zstd")
+    logger.info(f"Parquet report saved to {path}")
+
+
+def recover_journals(reports_dir: str) -> List[str]:
+    """Каталоги отчётов с журналом Parquet, оставшимся после аварийной остановки"""
+    if not os.path.isdir(reports_dir):
+        return []
+    return [
+        os.path.join(reports_dir, day_id)
+        for day_id in sorted(os.listdir(reports_dir))
+        if os.path.exists(os.path.join(reports_dir, day_id, JOURNAL_REPORT))
+    ]
+
+
+def read_parquet_report(path: str) -> Dict[str, pd.DataFrame]:
+    """Читает Parquet-отчёт за день и возвращает данные по комнатам в том же
+    виде, что и CSV-отчёты"""
+    df = pd.read_parquet(path)
+    rooms = {}
+    for room_name, room_df in df.groupby("room", observed=True, sort=False):
+        room_df = room_df.drop(columns="room").reset_index(drop=True)
+        minutes = room_df["time_minutes"]
+        room_df.insert(0, "time", [f"{t//60:02d}:{t%60:02d}" for t in minutes.tolist()])
+        rooms[str(room_name)] = room_df
+    return rooms
+
+
+def read_rollups(report_dir: str) -> Optional[pd.DataFrame]:
+    """Агрегаты min/mean/max за день из отчёта (None, если их нет)"""
+    for report_format, file_name in ROLLUPS_REPORTS.items():
+        path = os.path.join(report_dir, file_name)
+        if os.path.exists(path):
+            if report_format == "parquet":
+                return pd.read_parquet(path)
+            return pd.read_csv(path)
+    return None
+
+
+def read_parquet_metadata(path: str) -> Dict:
+    """Метаданные Parquet-отчёта (день, комнаты, число строк) без чтения данных"""
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_metadata(path)
+    schema = metadata.schema.to_arrow_schema().metadata or {}
+    return {
+        "day": int(schema.get(b"day", b"0")),
+        "rooms": json.loads(schema.get(b"rooms", b"[]")),
+        "rows": metadata.num_rows,
+    }
+
+
+def report_rooms(report_dir: str) -> List[str]:
+    """Комнаты, данные которых есть в отчёте за день"""
+    parquet_path = os.path.join(report_dir, PARQUET_REPORT)
+    if os.path.exists(parquet_path):
+        return read_parquet_metadata(parquet_path)["rooms"]
+    return sorted(
+        f[: -len("_data.csv")]
+        for f in os.listdir(report_dir)
+        if f.endswith("_data.csv")
+    )
+
+
+class ReportWorker:
+    """Фоновый процесс завершения дневных отчётов.
+
+    Данные дня уже записаны потоково (ReportStreamWriter); на смене дня
+    симулятор ставит задание и сразу продолжает тики, а перевод журнала в
+    Parquet и запись агрегатов через pandas идут в отдельном процессе.
+    Статусы последних заданий доступны через jobs(). Процесс запускается при
+    первом задании и перезапускается, если он аварийно завершился. Процесс
+    стартует через forkserver, а не fork: форк многопоточного сервера мог бы
+    унаследовать захваченные блокировки (журнала, тика, SQLite). on_done
+    вызывается с каталогом отчёта после каждого задания, успешного или нет.
+    """
+
+    MAX_JOBS = 100
+
+    def __init__(self, on_done: Optional[Callable[[str], None]] = None):
+        self.on_done = on_done
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: "OrderedDict[int, Dict]" = OrderedDict()
+        self._futures: Dict[int, Future] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _new_executor() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context(WORKER_START_METHOD)
+        )
+
+    def submit(
+        self,
+        day: int,
+        report_dir: str,
+        report_format: str = "csv",
+        room_names: Optional[List[str]] = None,
+        rollups: Optional[List[RollupRow]] = None,
+    ) -> int:
+        """Ставит в очередь завершение отчёта за день, возвращает id задания"""
+        if self._executor is None:
+            self._executor = self._new_executor()
+
+        with self._lock:
+            job_id = self._next_id
+            self._next_id += 1
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "day": day,
+                "day_id": os.path.basename(report_dir),
+                "status": "queued",
+                "submitted_at": datetime.now().isoformat(),
+                "finished_at": None,
+                "elapsed_seconds": None,
+                "error": None,
+            }
+            while len(self._jobs) > self.MAX_JOBS:
+                old_id, _ = self._jobs.popitem(last=False)
+                self._futures.pop(old_id, None)
+
+        try:
+            future = self._executor.submit(
+                finalize_day_report,
+                report_dir,
+                report_format,
+                day,
+                room_names,
+                rollups,
+            )
+        except BrokenProcessPool:
+            logger.warning("Report worker died, restarting it")
+            self._executor = self._new_executor()
+            future = self._executor.submit(
+                finalize_day_report,
+                report_dir,
+                report_format,
+                day,
+                room_names,
+                rollups,
+            )
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._on_done(job_id, f, report_dir))
+        logger.info(f"Report job {job_id} for day {day} queued ({report_dir})")
+        return job_id
+
+    def _on_done(self, job_id: int, future: Future, report_dir: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            self._futures.pop(job_id, None)
+            if job is not None:
+                job["finished_at"] = datetime.now().isoformat()
+                error = future.exception()
+                if error is not None:
+                    job["status"] = "failed"
+                    job["error"] = str(error)
+                    logger.error(f"Report job {job_id} failed: {error}")
+                else:
+                    job["status"] = "done"
+                    job["elapsed_seconds"] = future.result()["elapsed_seconds"]
+
+        if self.on_done is not None:
+            try:
+                self.on_done(report_dir)
+            except Exception as e:
+                logger.error(f"Report job {job_id} callback failed: {e}")
+
+    def jobs(self) -> List[Dict]:
+        """Статусы последних заданий, от новых к старым"""
+        with self._lock:
+            jobs = []
+            for job_id, job in reversed(self._jobs.items()):
+                future = self._futures.get(job_id)
+                if future is not None and future.running():
+                    job = {**job, "status": "running"}
+                jobs.append(dict(job))
+            return jobs
+
+    def shutdown(self, wait: bool = True):
+        """Дожидается незавершённых заданий и останавливает процесс"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
@@ -0,0 +1,155 @@
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from .sensor_log import METRICS
+
+ROLLUP_RESOLUTIONS = {"15min": 15, "hour": 60, "day": 1440}
+STATS = ("min", "mean", "max")
+
+# Закрытый интервал: (разрешение, абсолютная минута начала, число показаний,
+# массив (метрика, статистика, комната))
+RollupRow = Tuple[str, int, int, np.ndarray]
+
+
+class _Accumulator:
+    """Текущий интервал одного разрешения: минимум, сумма и максимум по комнатам"""
+
+    def __init__(self, minutes: int, n_rooms: int):
+        self.minutes = minutes
+        self.bucket = None
+        self.count = 0
+        self.min = np.full((len(METRICS), n_rooms), np.inf)
+        self.max = np.full((len(METRICS), n_rooms), -np.inf)
+        self.sum = np.zeros((len(METRICS), n_rooms))
+
+    def close(self) -> np.ndarray:
+        stats = np.stack((self.min, self.sum / self.count, self.max), axis=1)
+        self.count = 0
+        self.min.fill(np.inf)
+        self.max.fill(-np.inf)
+        self.sum.fill(0.0)
+        return stats
+
+
+class Rollups:
+    """Инкрементальные агрегаты показаний (min/mean/max) за 15 минут, час и день.
+
+    Каждое показание обновляет открытые интервалы всех разрешений за O(комнат);
+    интервал закрывается, когда приходит показание из следующего интервала или
+    при явном flush() на смене дня. Закрытые интервалы копятся до take().
+    """
+
+    def __init__(self, room_names: List[str]):
+        self.room_names = list(room_names)
+        self._accumulators = {
+            name: _Accumulator(minutes, len(self.room_names))
+            for name, minutes in ROLLUP_RESOLUTIONS.items()
+        }
+        self._completed: List[RollupRow] = []
+
+    def add(self, minute: int, temperature, humidity, light) -> List[RollupRow]:
+        """Учитывает показания всех комнат за абсолютную минуту, возвращает
+        закрывшиеся при этом интервалы"""
+        values = np.array((temperature, humidity, light), dtype=np.float64)
+        closed = []
+        for name, acc in self._accumulators.items():
+            bucket = minute // acc.minutes
+            if acc.count and bucket != acc.bucket:
+                closed.append((name, acc.bucket * acc.minutes, acc.count, acc.close()))
+            acc.bucket = bucket
+            acc.count += 1
+            np.minimum(acc.min, values, out=acc.min)
+            np.maximum(acc.max, values, out=acc.max)
+            acc.sum += values
+        self._completed.extend(closed)
+        return closed
+
+    def flush(self) -> List[RollupRow]:
+        """Закрывает все открытые интервалы (в том числе неполные)"""
+        closed = [
+            (name, acc.bucket * acc.minutes, acc.count, acc.close())
+            for name, acc in self._accumulators.items()
+            if acc.count
+        ]
+        self._completed.extend(closed)
+        return closed
+
+    def pending_starts(self, minute: int) -> Dict[str, int]:
+        """Начало самого раннего интервала каждого разрешения, который ещё не
+        закрыт, если следующее показание придёт за минуту minute"""
+        return {
+            name: (acc.bucket if acc.count else minute // acc.minutes) * acc.minutes
+            for name, acc in self._accumulators.items()
+        }
+
+    def to_state(self) -> Tuple[Dict, Dict[str, np.ndarray]]:
+        """Состояние для контрольной точки: простые значения и массивы"""
+        meta = {
+            "accumulators": {
+                name: {"bucket": acc.bucket, "count": acc.count}
+                for name, acc in self._accumulators.items()
+            },
+            "completed": [
+                [name, minute, count] for name, minute, count, _ in self._completed
+            ],
+        }
+        arrays = {}
+        for name, acc in self._accumulators.items():
+            arrays[f"{name}_min"] = acc.min
+            arrays[f"{name}_max"] = acc.max
+            arrays[f"{name}_sum"] = acc.sum
+        arrays["completed"] = np.array(
+            [stats for _, _, _, stats in self._completed], dtype=np.float64
+        ).reshape(-1, len(METRICS), len(STATS), len(self.room_names))
+        return meta, arrays
+
+    @classmethod
+    def from_state(
+        cls, room_names: List[str], meta: Dict, arrays: Dict[str, np.ndarray]
+    ) -> "Rollups":
+        """Восстанавливает агрегаты по результату to_state()"""
+        rollups = cls(room_names)
+        for name, acc in rollups._accumulators.items():
+            acc.bucket = meta["accumulators"][name]["bucket"]
+            acc.count = meta["accumulators"][name]["count"]
+            acc.min[:] = arrays[f"{name}_min"]
+            acc.max[:] = arrays[f"{name}_max"]
+            acc.sum[:] = arrays[f"{name}_sum"]
+        rollups._completed = [
+            (name, minute, count, stats)
+            for (name, minute, count), stats in zip(
+                meta["completed"], arrays["completed"]
+            )
+        ]
+        return rollups
+
+    def take(self) -> List[RollupRow]:
+        """Забирает накопленные закрытые интервалы"""
+        completed, self._completed = self._completed, []
+        return completed
+
+
+def rollups_frame(rows: List[RollupRow], room_names: List[str]) -> pd.DataFrame:
+    """Таблица агрегатов в длинном формате: строка на интервал и комнату,
+    время интервала - минута суток его начала"""
+    n_rooms = len(room_names)
+    columns: Dict[str, list] = {
+        "resolution": [],
+        "room": [],
+        "time_minutes": [],
+        "count": [],
+    }
+    stats_columns = {f"{metric}_{stat}": [] for metric in METRICS for stat in STATS}
+    for name, minute, count, stats in rows:
+        columns["resolution"] += [name] * n_rooms
+        columns["room"] += room_names
+        columns["time_minutes"] += [minute % 1440] * n_rooms
+        columns["count"] += [count] * n_rooms
+        for m, metric in enumerate(METRICS):
+            for s, stat in enumerate(STATS):
+                stats_columns[f"{metric}_{stat}"].append(stats[m, s])
+
+    df = pd.DataFrame(columns)
+    for column, values in stats_columns.items():
+        df[column] = np.concatenate(values) if values else np.empty(0)
+    return df
@@ -0,0 +1,115 @@
+import math
+from typing import Dict, Iterable, Iterator, List, Tuple
+import numpy as np
+
+METRICS = ("temperature", "humidity", "light")
+MINUTES_PER_DAY = 1440
+
+
+class SensorLog:
+    """Кольцевой столбцовый буфер показаний датчиков за сутки.
+
+    Память выделяется один раз: время хранится в массиве (capacity,), показания -
+    в массиве (метрика, комната, capacity). При смене дня буфер не пересоздаётся,
+    а очищается сбросом счётчика, поэтому расход памяти не растёт со временем
+    работы симулятора. Чтение возвращает представления NumPy без копирования.
+    """
+
+    def __init__(self, room_names: Iterable[str], step_minutes: float = 1):
+        self.room_names: List[str] = list(room_names)
+        self.room_index = {name: i for i, name in enumerate(self.room_names)}
+        self.metric_index = {name: i for i, name in enumerate(METRICS)}
+        self.capacity = math.ceil(MINUTES_PER_DAY / step_minutes)
+        self.time = np.zeros(self.capacity, dtype=np.int32)
+        self.values = np.zeros(
+            (len(METRICS), len(self.room_names), self.capacity), dtype=np.float64
+        )
+        self.size = 0
+        self._next = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, time_minutes: int, temperature, humidity, light):
+        """Записывает строку показаний: по одному значению каждой метрики на комнату.
+        При переполнении перезаписывается самая старая строка"""
+        row = self._next
+        self.time[row] = time_minutes
+        self.values[0, :, row] = temperature
+        self.values[1, :, row] = humidity
+        self.values[2, :, row] = light
+        self._next = (row + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def clear(self):
+        """Очищает буфер без освобождения памяти"""
+        self.size = 0
+        self._next = 0
+
+    def _ordered(self, array: np.ndarray) -> np.ndarray:
+        """Строки в хронологическом порядке; без копии, пока буфер не переполнялся"""
+        if self.size < self.capacity or self._next == 0:
+            return array[..., : self.size]
+        return np.concatenate((array[..., self._next :], array[..., : self._next]), -1)
+
+    def times(self) -> np.ndarray:
+        """Время записей (минуты от начала суток)"""
+        return self._ordered(self.time)
+
+    def column(self, room_name: str, metric: str) -> np.ndarray:
+        """Ряд значений одной метрики одной комнаты"""
+        return self._ordered(
+            self.values[self.metric_index[metric], self.room_index[room_name]]
+        )
+
+    def metric(self, metric: str) -> np.ndarray:
+        """Значения метрики по всем комнатам, форма (комнаты, записи)"""
+        return self._ordered(self.values[self.metric_index[metric]])
+
+    def room(self, room_name: str) -> Dict[str, np.ndarray]:
+        """Лог комнаты в виде {"time": ..., "temperature": ..., ...}"""
+        data = {"time": self.times()}
+        for metric in METRICS:
+            data[metric] = self.column(room_name, metric)
+        return data
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, np.ndarray]]]:
+        """Пары (комната, лог комнаты) в порядке комнат дома"""
+        for room_name in self.room_names:
+            yield room_name, self.room(room_name)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Накопленные записи в хронологическом порядке (для контрольной точки)"""
+        return {"time": self.times(), "values": self._ordered(self.values)}
+
+    @classmethod
+    def from_arrays(
+        cls, room_names: Iterable[str], capacity: int, time: np.ndarray, values
+    ) -> "SensorLog":
+        """Восстанавливает буфер ёмкостью capacity по записям из to_arrays()"""
+        log = cls(room_names)
+        if capacity != log.capacity:
+            log.capacity = capacity
+            log.time = np.zeros(capacity, dtype=np.int32)
+            log.values = np.zeros(
+                (len(METRICS), len(log.room_names), capacity), dtype=np.float64
+            )
+        size = len(time)
+        log.time[:size] = time
+        log.values[..., :size] = values
+        log.size = size
+        log._next = size % capacity
+        return log
+
+    def copy(self) -> "SensorLog":
+        """Независимая копия накопленных записей"""
+        log = SensorLog.__new__(SensorLog)
+        log.room_names = list(self.room_names)
+        log.room_index = dict(self.room_index)
+        log.metric_index = dict(self.metric_index)
+        log.capacity = self.capacity
+        log.time = self.time.copy()
+        log.values = self.values.copy()
+        log.size = self.size
+        log._next = self._next
+        return log
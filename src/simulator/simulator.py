@@ -2,27 +2,84 @@ from datetime import datetime
 import time
 import math
 import asyncio
-import pandas as pd
-import matplotlib.pyplot as plt
 from .models import House, RoomType, DeviceType, DeviceStatus, Room, WeatherType
-from typing import Dict, Optional
+from .trace import WeatherTrace
+from .metrics import TickMetrics
+from .sensor_log import SensorLog
+from .reports import (
+    FSYNC_POLICIES,
+    REPORT_FORMATS,
+    ReportStreamWriter,
+    ReportWorker,
+    recover_journals,
+)
+from .history import HistoryStore
+from .rollups import Rollups
+from .versioning import StateSnapshot, StateTracker
+from .topology import load_topology
+from .registry import DeviceRegistry
+from .engine import ArrayEngine, INTEGRATORS, relax_temperature, relax_humidity
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
 import random
 import logging
 import os
+import queue
+import threading
+import json
+import zipfile
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Версия формата файла контрольной точки
+CHECKPOINT_FORMAT = 2
+
+# Число тиков ускоренной прокрутки между освобождениями блокировки тика
+FAST_FORWARD_CHUNK_TICKS = 60
+
+# Статус для отсутствующих в комнате кондиционера или климат-установки
+OFF_STATUS = {"power": False, "target_temp": 0, "target_humidity": 0, "intensity": 0}
+
 
 class SmartHomeSimulator:
-    def __init__(self):
+    def __init__(
+        self,
+        vectorized: bool = False,
+        integrator: str = "euler",
+        step_minutes: float = 1,
+        weather_trace: Optional[str] = None,
+        topology: Optional[str] = None,
+        report_format: str = "csv",
+        history_path: Optional[str] = None,
+        report_flush_ticks: int = 60,
+        report_fsync: str = "close",
+    ):
+        if integrator not in INTEGRATORS:
+            raise ValueError(f"Unknown integrator: {integrator}")
+        if report_format not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format: {report_format}")
+        if report_fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {report_fsync}")
+        if integrator == "euler" and step_minutes > 1:
+            logger.warning(
+                f"Euler integrator with {step_minutes}-minute steps is inaccurate, "
+                "use the exponential integrator for coarse steps"
+            )
+
         initial_time_of_day = 1.0
-        self.house = House(
-            rooms={
+        if topology:
+            rooms = load_topology(topology)
+        else:
+            rooms = {
                 RoomType.BATHROOM: self._create_bathroom(),
                 RoomType.KITCHEN: self._create_room(RoomType.KITCHEN),
                 RoomType.BEDROOM: self._create_room(RoomType.BEDROOM),
                 RoomType.LIVING_ROOM: self._create_room(RoomType.LIVING_ROOM),
-            },
+            }
+
+        self.house = House(
+            rooms=rooms,
             environment={
                 "outside_temp": 20.0,
                 "outside_humidity": 50.0,
@@ -36,176 +93,194 @@ class SmartHomeSimulator:
 
         self.running = False
         self.last_update = time.time()
-        self.last_motion_room: Optional[RoomType] = None
+        self.last_motion_room: Optional[str] = None
         self.weather_change_counter = 0
-
-        self.sensor_data = self._initialize_sensor_logs()
+        self.last_day_time = 0
+        self._tick_lock = threading.Lock()
+        # Команды, изменяющие состояние, выполняет цикл тиков (см. _submit)
+        self._commands: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._commands_ready: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        # Снимок состояния публикуется не чаще раза в snapshot_interval секунд,
+        # а после команд - сразу
+        self.snapshot_interval = 0.05
+        self._last_publish = 0.0
+        self.integrator = integrator
+        self.step_minutes = step_minutes
+        self.weather_trace = WeatherTrace(weather_trace) if weather_trace else None
+        self.devices = DeviceRegistry(self.house)
+        self.metrics = TickMetrics()
+        self.state_tracker = StateTracker()
+        # Вызываются после каждого тика (под блокировкой тика) с симулятором
+        self.tick_listeners: List[Callable[["SmartHomeSimulator"], None]] = []
+        # Вызываются с каждым новым опубликованным снимком состояния (после
+        # тика или команды, под блокировкой тика)
+        self.snapshot_listeners: List[Callable[[StateSnapshot], None]] = []
+        # Вызываются с каталогом отчёта за день, когда его начали писать и когда
+        # его завершение закончилось (из потока фонового процесса отчётов)
+        self.report_listeners: List[Callable[[str, bool], None]] = []
+        self.reports = ReportWorker(on_done=self._report_finished)
+        self.report_format = report_format
+        self.report_flush_ticks = report_flush_ticks
+        self.report_fsync = report_fsync
+        self._report_writer: Optional[ReportStreamWriter] = None
+        self._report_day = 0
+        self.engine = ArrayEngine(self.devices, integrator) if vectorized else None
+
+        self.sensor_log = SensorLog(self.house.rooms, step_minutes)
+        self.rollups = Rollups(self.sensor_log.room_names)
+        self.history = HistoryStore(history_path) if history_path else None
 
         os.makedirs("reports", exist_ok=True)
 
-    def _initialize_sensor_logs(self) -> Dict:
-        """Инициализирует структуру для хранения логов датчиков"""
-        data = {}
-        for room_type in RoomType:
-            data[room_type.value] = {
-                "time": [],
-                "temperature": [],
-                "humidity": [],
-                "light": [],
-            }
-        return data
-
     def _log_sensor_data(self):
         """Записывает текущие показания датчиков в логи"""
         current_time = self.house.time_minutes
 
-        for room_type, room in self.house.rooms.items():
-            temp = room.devices.get(f"temp_sensor_{room_type.value}").status.get(
-                "temperature", 0
-            )
-            humidity = room.devices.get(
-                f"humidity_sensor_{room_type.value}"
-            ).status.get("humidity", 0)
-            light = room.devices.get(f"light_sensor_{room_type.value}").status.get(
-                "light_level", 0
+        if self.engine:
+            readings = self.engine.sensor_readings()
+        else:
+            rooms = self.house.rooms
+            readings = (
+                [
+                    self._sensor_value(room, DeviceType.TEMP_SENSOR, "temperature")
+                    for room in rooms
+                ],
+                [
+                    self._sensor_value(room, DeviceType.HUMIDITY_SENSOR, "humidity")
+                    for room in rooms
+                ],
+                [
+                    self._sensor_value(room, DeviceType.LIGHT_SENSOR, "light_level")
+                    for room in rooms
+                ],
             )
 
-            room_data = self.sensor_data[room_type.value]
-            room_data["time"].append(current_time)
-            room_data["temperature"].append(temp)
-            room_data["humidity"].append(humidity)
-            room_data["light"].append(light)
-
-    def _generate_reports(self):
-        """Генерирует отчеты (графики и CSV) за день"""
-        day = self.house.days_passed
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_dir = f"reports/day_{day}_{timestamp}"
-        os.makedirs(report_dir, exist_ok=True)
-
-        logger.info(f"Generating reports for day {day} in {report_dir}")
+        minute = self.absolute_minute()
+        room_names = self.sensor_log.room_names
+        self.sensor_log.append(current_time, *readings)
+        closed = self.rollups.add(minute, *readings)
+        if self.history:
+            self.history.append(minute, room_names, *readings)
+            if closed:
+                self.history.append_rollups(room_names, closed)
+
+        self._stream_reports()
+
+    def absolute_minute(self) -> int:
+        """Минута симуляции от её начала (с учётом прошедших дней)"""
+        return int(self.house.days_passed * 1440 + self.house.time_minutes)
+
+    def _sensor_value(self, room_name: str, device_type: DeviceType, key: str):
+        """Текущее показание датчика комнаты (0, если датчика нет)"""
+        sensor = self.devices.get(room_name, device_type)
+        return sensor.status.get(key, 0) if sensor else 0
+
+    def _stream_reports(self):
+        """Дописывает строки дневного лога в файлы отчёта раз в report_flush_ticks
+        тиков; файлы дня создаются при первой записи"""
+        if self._report_writer is None:
+            self._report_day = self.house.days_passed + 1
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self._report_writer = ReportStreamWriter(
+                f"reports/day_{self._report_day}_{timestamp}",
+                self.sensor_log.room_names,
+                self.report_format,
+                self.report_fsync,
+            )
 
-        for room_type in RoomType:
-            room_name = room_type.value
-            room_data = self.sensor_data[room_name]
+            for listener in self.report_listeners:
+                listener(self._report_writer.report_dir, False)
+
+        writer = self._report_writer
+        if len(self.sensor_log) - writer.rows_written >= self.report_flush_ticks:
+            writer.write(self.sensor_log)
+
+    def _finish_report_file(self, rollups=None):
+        """Дописывает и закрывает файлы текущего дня и ставит задание на
+        завершение отчёта"""
+        writer = self._report_writer
+        if writer is None:
+            return
+        writer.write(self.sensor_log)
+        writer.close()
+        self._report_writer = None
+        self.reports.submit(
+            self._report_day,
+            writer.report_dir,
+            self.report_format,
+            writer.room_names,
+            rollups,
+        )
 
-            formatted_time = [f"{t//60:02d}:{t%60:02d}" for t in room_data["time"]]
+    def _report_finished(self, report_dir: str):
+        for listener in self.report_listeners:
+            listener(report_dir, True)
 
-            df = pd.DataFrame(
-                {
-                    "time": formatted_time,
-                    "time_minutes": room_data["time"],
-                    "temperature": room_data["temperature"],
-                    "humidity": room_data["humidity"],
-                    "light": room_data["light"],
-                }
-            )
+    def _generate_reports(self):
+        """Завершает отчёт за день: данные уже записаны потоково, остаётся
+        дописать хвост, закрыть файлы и сохранить агрегаты"""
+        started = time.perf_counter()
+        logger.info(f"Finalizing reports for day {self._report_day}")
+
+        closed = self.rollups.flush()
+        if self.history and closed:
+            self.history.append_rollups(self.sensor_log.room_names, closed)
+        self._finish_report_file(self.rollups.take())
+
+        self.sensor_log.clear()
+        self.metrics.observe("generate_reports", time.perf_counter() - started)
+
+    def current_report_id(self) -> Optional[str]:
+        """Каталог отчёта, который сейчас пишется потоково"""
+        if self._report_writer is None:
+            return None
+        return os.path.basename(self._report_writer.report_dir)
+
+    def sensor_log_snapshot(self) -> Tuple[Optional[str], int, SensorLog]:
+        """Копия лога датчиков текущего дня вместе с каталогом его отчёта и
+        номером дня, снятая между тиками"""
+        return self._submit(self._copy_sensor_log)
+
+    def _copy_sensor_log(self) -> Tuple[Optional[str], int, SensorLog]:
+        return (
+            self.current_report_id(),
+            self.house.days_passed + 1,
+            self.sensor_log.copy(),
+        )
 
-            csv_path = f"{report_dir}/{room_name}_data.csv"
-            df.to_csv(csv_path, index=False)
-            logger.info(f"CSV report saved to {csv_path}")
-
-            self._create_plots(room_name, room_data, report_dir)
-
-        self._create_comparison_plots(report_dir)
-
-        self.sensor_data = self._initialize_sensor_logs()
-
-    def _create_plots(self, room_name: str, room_data: Dict, report_dir: str):
-        """Создаёт графики для одной комнаты"""
-        time_hours = [t / 60 for t in room_data["time"]]
-
-        plt.figure(figsize=(10, 6))
-        plt.plot(time_hours, room_data["temperature"])
-        plt.title(f"Temperature in {room_name}")
-        plt.xlabel("Time (hours)")
-        plt.ylabel("Temperature (°C)")
-        plt.grid(True)
-        plt.savefig(f"{report_dir}/{room_name}_temperature.png")
-        plt.close()
-
-        plt.figure(figsize=(10, 6))
-        plt.plot(time_hours, room_data["humidity"])
-        plt.title(f"Humidity in {room_name}")
-        plt.xlabel("Time (hours)")
-        plt.ylabel("Humidity (%)")
-        plt.grid(True)
-        plt.savefig(f"{report_dir}/{room_name}_humidity.png")
-        plt.close()
-
-        plt.figure(figsize=(10, 6))
-        plt.plot(time_hours, room_data["light"])
-        plt.title(f"Light level in {room_name}")
-        plt.xlabel("Time (hours)")
-        plt.ylabel("Light level (%)")
-        plt.grid(True)
-        plt.savefig(f"{report_dir}/{room_name}_light.png")
-        plt.close()
-
-    def _create_comparison_plots(self, report_dir: str):
-        """Создаёт сравнительные графики для всех комнат"""
-        plt.figure(figsize=(12, 7))
-        for room_type in RoomType:
-            room_name = room_type.value
-            time_hours = [t / 60 for t in self.sensor_data[room_name]["time"]]
-            plt.plot(
-                time_hours, self.sensor_data[room_name]["temperature"], label=room_name
-            )
-        plt.title("Temperature Comparison Between Rooms")
-        plt.xlabel("Time (hours)")
-        plt.ylabel("Temperature (°C)")
-        plt.legend()
-        plt.grid(True)
-        plt.savefig(f"{report_dir}/temperature_comparison.png")
-        plt.close()
-
-        plt.figure(figsize=(12, 7))
-        for room_type in RoomType:
-            room_name = room_type.value
-            time_hours = [t / 60 for t in self.sensor_data[room_name]["time"]]
-            plt.plot(
-                time_hours, self.sensor_data[room_name]["humidity"], label=room_name
-            )
-        plt.title("Humidity Comparison Between Rooms")
-        plt.xlabel("Time (hours)")
-        plt.ylabel("Humidity (%)")
-        plt.legend()
-        plt.grid(True)
-        plt.savefig(f"{report_dir}/humidity_comparison.png")
-        plt.close()
-
-        plt.figure(figsize=(12, 7))
-        for room_type in RoomType:
-            room_name = room_type.value
-            time_hours = [t / 60 for t in self.sensor_data[room_name]["time"]]
-            plt.plot(time_hours, self.sensor_data[room_name]["light"], label=room_name)
-        plt.title("Light Level Comparison Between Rooms")
-        plt.xlabel("Time (hours)")
-        plt.ylabel("Light level (%)")
-        plt.legend()
-        plt.grid(True)
-        plt.savefig(f"{report_dir}/light_comparison.png")
-        plt.close()
+    def recover_reports(self):
+        """Завершает отчёты, журналы которых остались после аварийной остановки"""
+        for report_dir in recover_journals("reports"):
+            day_id = os.path.basename(report_dir)
+            day = day_id.split("_")[1] if day_id.startswith("day_") else "0"
+            logger.info(f"Recovering interrupted report {report_dir}")
+            self.reports.submit(int(day) if day.isdigit() else 0, report_dir, "parquet")
 
     def set_simulation_speed(self, speed: float) -> bool:
         """Устанавливает скорость симуляции"""
-        if speed not in [1.0, 15.0, 60.0]:
+        if speed not in [1.0, 15.0, 60.0, 3600.0]:
             logger.warning(
-                f"Invalid simulation speed: {speed}. Must be 1.0, 15.0, 60.0"
+                f"Invalid simulation speed: {speed}. Must be 1.0, 15.0, 60.0, 3600.0"
             )
             return False
 
         logger.info(f"Setting simulation speed to {speed}x")
-        self.house.simulation_speed = speed
+        self._submit(self._set_house_field, "simulation_speed", speed)
         return True
 
     def set_weather(self, weather: WeatherType) -> bool:
         """Устанавливает погоду вручную"""
         if weather not in [WeatherType.SUNNY, WeatherType.CLOUDY, WeatherType.RAINY]:
             return False
-        self.house.weather = weather
+        self._submit(self._set_house_field, "weather", weather)
         return True
 
+    def _set_house_field(self, name: str, value):
+        setattr(self.house, name, value)
+        self.state_tracker.mark_changed()
+
     def get_simulation_time(self):
         """Возвращает текущее время симуляции"""
         return {
@@ -320,72 +395,200 @@ class SmartHomeSimulator:
 
     def get_house_state(self) -> House:
         """Возвращает текущее состояние дома с проверкой целостности"""
+        if self.engine:
+            return self.engine.sync_house()
         return self.house
 
-    def update_device(self, room_type: RoomType, device_id: str, status: Dict) -> bool:
+    def state_version(self) -> int:
+        """Версия состояния дома: растёт при каждом видимом изменении"""
+        return self.state_snapshot().version
+
+    def state_snapshot(self) -> StateSnapshot:
+        """Последний опубликованный снимок состояния дома (JSON и словарь;
+        словарь изменять нельзя). Пока идёт симуляция, снимки публикует цикл
+        тиков, и читатель никогда не видит дом посреди тика"""
+        snapshot = self.state_tracker.current
+        if snapshot is None or self._loop is None:
+            with self._tick_lock:
+                snapshot = self._publish_state(force=True)
+        return snapshot
+
+    def get_state_delta(self, since: int) -> Dict:
+        """Изменения состояния дома после версии since (см. StateTracker)"""
+        self.state_snapshot()
+        return self.state_tracker.delta(since)
+
+    def _publish_state(self, force: bool = False) -> Optional[StateSnapshot]:
+        """Публикует снимок состояния (только из цикла тиков или под блокировкой)"""
+        now = time.perf_counter()
+        if not force and now - self._last_publish < self.snapshot_interval:
+            return None
+        self._last_publish = now
+        previous = self.state_tracker.current
+        snapshot = self.state_tracker.publish(self.get_house_state())
+        if snapshot is not previous:
+            for listener in self.snapshot_listeners:
+                listener(snapshot)
+        return snapshot
+
+    def _submit(self, command: Callable, *args):
+        """Выполняет команду, изменяющую состояние, и возвращает её результат.
+
+        Пока идёт симуляция, команда ставится в очередь, и её выполняет цикл
+        тиков в начале следующего тика (или сразу, если он ждёт следующего шага),
+        а вызывающий поток ждёт результата. Так у состояния один писатель, и
+        команды не пересекаются с тиками. Без цикла тиков команда выполняется
+        сразу под блокировкой тика."""
+        future = Future()
+        self._commands.put((command, args, future))
+        loop = self._loop
+        if loop is not None and self._loop_thread != threading.get_ident():
+            try:
+                loop.call_soon_threadsafe(self._commands_ready.set)
+                return future.result()
+            except RuntimeError:
+                # Цикл событий уже закрыт, очередь разбирает вызывающий
+                pass
+        with self._tick_lock:
+            if self._apply_commands():
+                self._publish_state(force=True)
+        return future.result()
+
+    def _apply_commands(self) -> bool:
+        """Выполняет накопившиеся команды (под блокировкой тика). True, если
+        были команды"""
+        applied = False
+        while True:
+            try:
+                command, args, future = self._commands.get_nowait()
+            except queue.Empty:
+                return applied
+            applied = True
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(command(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+    def update_device(self, room_type: str, device_id: str, status: Dict) -> bool:
         """Обновляет состояние устройства с валидацией входящих данных"""
+        return self._submit(self._update_device, room_type, device_id, status)
+
+    def _update_device(self, room_type: str, device_id: str, status: Dict) -> bool:
         try:
-            if not isinstance(room_type, RoomType) and not isinstance(room_type, str):
-                logger.error(f"Invalid room type: {room_type}")
+            error = self._check_device_update(room_type, device_id, status)
+            if error is not None:
+                logger.error(error)
                 return False
 
-            if isinstance(room_type, str):
-                try:
-                    room_type = RoomType(room_type)
-                except ValueError:
-                    logger.error(f"Invalid room type: {room_type}")
-                    return False
+            self._apply_device_update(room_type, device_id, status)
+            self.state_tracker.mark_changed()
+            return True
 
-            if room_type not in self.house.rooms:
-                logger.error(f"Room not found: {room_type}")
-                return False
+        except Exception as e:
+            logger.error(f"Error updating device {device_id}: {e}")
+            return False
 
-            room = self.house.rooms[room_type]
+    def update_devices(
+        self, updates: List[Tuple[str, str, Dict]], atomic: bool = False
+    ) -> List[Dict]:
+        """Применяет пакет обновлений (комната, id устройства, статус) целиком
+        между двумя тиками: пакет - одна команда, в которой сначала проверяются
+        все обновления, затем применяются корректные. При atomic=True одна
+        ошибка отменяет весь пакет. Возвращает результат по каждому обновлению"""
+        results = self._submit(self._update_devices, updates, atomic)
+
+        failed = [result for result in results if not result["success"]]
+        logger.info(
+            f"Applied {len(results) - len(failed)} of {len(results)} device updates"
+        )
+        for result in failed:
+            logger.error(result["error"])
+        return results
+
+    def _update_devices(
+        self, updates: List[Tuple[str, str, Dict]], atomic: bool
+    ) -> List[Dict]:
+        errors = []
+        for room_type, device_id, status in updates:
+            try:
+                errors.append(self._check_device_update(room_type, device_id, status))
+            except Exception as e:
+                errors.append(f"Error validating device {device_id}: {e}")
+
+        rejected = atomic and any(errors)
+        results = []
+        for (room_type, device_id, status), error in zip(updates, errors):
+            if error is None and rejected:
+                error = "Batch rejected: another update in it is invalid"
+            elif error is None:
+                self._apply_device_update(room_type, device_id, status)
+            results.append(
+                {
+                    "room": room_type,
+                    "device_id": device_id,
+                    "success": error is None,
+                    "error": error,
+                }
+            )
 
-            if not isinstance(device_id, str) or device_id not in room.devices:
-                logger.error(f"Device not found: {device_id} in room {room_type}")
-                return False
+        if any(result["success"] for result in results):
+            self.state_tracker.mark_changed()
+        return results
 
-            if not isinstance(status, dict):
-                logger.error(f"Invalid status format for device {device_id}: {status}")
-                return False
+    def _check_device_update(
+        self, room_type: str, device_id: str, status: Dict
+    ) -> Optional[str]:
+        """Проверяет обновление устройства, возвращает текст ошибки или None"""
+        if not isinstance(room_type, str):
+            return f"Invalid room type: {room_type}"
 
-            device = room.devices[device_id]
+        if room_type not in self.house.rooms:
+            return f"Room not found: {room_type}"
 
-            device_type = device.type
-            if isinstance(device_type, str):
-                try:
-                    device_type = DeviceType(device_type)
-                except ValueError:
-                    logger.error(f"Invalid device type: {device_type}")
-                    return False
+        room = self.house.rooms[room_type]
 
-            if not self._validate_device_status(device_type, status, device.status):
-                logger.error(f"Invalid status values for device {device_id}: {status}")
-                return False
+        if not isinstance(device_id, str) or device_id not in room.devices:
+            return f"Device not found: {device_id} in room {room_type}"
 
-            if device_type == DeviceType.MOTION_SENSOR and status.get(
-                "detected", False
-            ):
-                for _, r in self.house.rooms.items():
-                    for d_id, d in r.devices.items():
-                        if d.type == DeviceType.MOTION_SENSOR and d_id != device_id:
-                            d.status["detected"] = False
-                self.last_motion_room = room_type
-
-            for key in status:
-                if key in device.status:
-                    device.status[key] = status[key]
-                else:
-                    logger.warning(
-                        f"Ignoring unknown property '{key}' for device {device_id}"
-                    )
+        if not isinstance(status, dict):
+            return f"Invalid status format for device {device_id}: {status}"
 
-            return True
+        device = room.devices[device_id]
 
-        except Exception as e:
-            logger.error(f"Error updating device {device_id}: {e}")
-            return False
+        device_type = device.type
+        if isinstance(device_type, str):
+            try:
+                device_type = DeviceType(device_type)
+            except ValueError:
+                return f"Invalid device type: {device_type}"
+
+        if not self._validate_device_status(device_type, status, device.status):
+            return f"Invalid status values for device {device_id}: {status}"
+
+        return None
+
+    def _apply_device_update(self, room_type: str, device_id: str, status: Dict):
+        """Применяет проверенное обновление устройства"""
+        device = self.house.rooms[room_type].devices[device_id]
+
+        if device.type == DeviceType.MOTION_SENSOR and status.get("detected", False):
+            for _, d in self.devices.by_type[DeviceType.MOTION_SENSOR]:
+                if d.id != device_id:
+                    d.status["detected"] = False
+            self.last_motion_room = room_type
+
+        for key in status:
+            if key in device.status:
+                device.status[key] = status[key]
+            else:
+                logger.warning(
+                    f"Ignoring unknown property '{key}' for device {device_id}"
+                )
+
+        if self.engine:
+            self.engine.mark_actuators_dirty(room_type)
 
     def _validate_device_status(
         self, device_type: DeviceType, new_status: Dict, current_status: Dict
@@ -406,14 +609,6 @@ class SmartHomeSimulator:
                 f"Validating device status for type: {device_type}, status: {new_status}"
             )
 
-            if isinstance(device_type, str):
-                try:
-                    device_type = DeviceType(device_type)
-                    logger.debug(f"Converted string device type to enum: {device_type}")
-                except ValueError:
-                    logger.error(f"Invalid device type string: {device_type}")
-                    return False
-
             for key in new_status:
                 if key not in current_status:
                     logger.error(
@@ -530,35 +725,233 @@ class SmartHomeSimulator:
         """Запускает симуляцию"""
         self.running = True
         self.last_update = time.time()
-        last_day_time = 0
+        self.last_day_time = 0
+        self._commands_ready = asyncio.Event()
+        self._loop_thread = threading.get_ident()
+        self._loop = asyncio.get_running_loop()
 
-        while self.running:
-            current_time = time.time()
-            elapsed_sim_time = 1
-            self._log_sensor_data()
-            minutes_in_day = 1440
-            current_minutes = self.house.time_of_day * 60
-            new_minutes = current_minutes + (elapsed_sim_time)
+        last_tick = None
+        next_tick = 0.0
 
-            if int(new_minutes / minutes_in_day) > int(last_day_time / minutes_in_day):
-                self.house.days_passed += 1
-                logger.info(f"New day started: Day {self.house.days_passed}")
-                self._on_day_change()
-
-            last_day_time = new_minutes
-
-            new_minutes = new_minutes % minutes_in_day
-
-            self.house.time_of_day = new_minutes / 60
-            self.house.time_minutes = int(new_minutes)
+        try:
+            while self.running:
+                self._commands_ready.clear()
+                if not self._tick_lock.acquire(blocking=False):
+                    # Идёт ускоренная прокрутка, тики и команды выполняет она
+                    last_tick = None
+                    await asyncio.sleep(0.1)
+                    continue
+                try:
+                    ticked = time.perf_counter() >= next_tick
+                    if ticked:
+                        self._tick(self.step_minutes)
+                    elif self._apply_commands():
+                        # Команды между тиками не ждут следующего шага
+                        self._publish_state(force=True)
+                finally:
+                    self._tick_lock.release()
+
+                if ticked:
+                    interval = self.step_minutes / self.house.simulation_speed
+                    now = time.perf_counter()
+                    if last_tick is not None:
+                        self.metrics.observe_interval(now - last_tick, interval)
+                    last_tick = now
+                    next_tick = now + interval
 
-            self._update_environment(elapsed_sim_time)
+                try:
+                    await asyncio.wait_for(
+                        self._commands_ready.wait(),
+                        max(0.0, next_tick - time.perf_counter()),
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._loop = None
+            with self._tick_lock:
+                self._apply_commands()
+
+    def fast_forward(self, days: float) -> Dict:
+        """Прокручивает симуляцию на заданное число дней без ожидания реального
+        времени. Блокировка тика отпускается каждые FAST_FORWARD_CHUNK_TICKS
+        тиков, чтобы длинная прокрутка не останавливала остальные запросы"""
+        if not math.isfinite(days) or days < 0:
+            raise ValueError(f"Invalid number of days: {days}")
+        ticks = int(days * 1440 / self.step_minutes)
+        started = time.time()
+        logger.info(f"Fast-forwarding simulation by {days} days ({ticks} ticks)")
+
+        for chunk_start in range(0, ticks, FAST_FORWARD_CHUNK_TICKS):
+            with self._tick_lock:
+                for _ in range(min(FAST_FORWARD_CHUNK_TICKS, ticks - chunk_start)):
+                    self._tick(self.step_minutes)
+                self._publish_state(force=True)
+
+        elapsed = time.time() - started
+        logger.info(f"Fast-forward finished in {elapsed:.2f}s")
+        return {
+            "ticks": ticks,
+            "days_passed": self.house.days_passed,
+            "time_minutes": self.house.time_minutes,
+            "elapsed_seconds": elapsed,
+        }
 
+    def _tick(self, elapsed_sim_time: float):
+        """Выполняет один шаг симуляции (время в минутах)"""
+        current_time = time.time()
+        perf_counter = time.perf_counter
+        metrics = self.metrics
+        commands = self._apply_commands()
+        tick_started = perf_counter()
+
+        self._log_sensor_data()
+        phase_started = perf_counter()
+        metrics.observe("log_sensor_data", phase_started - tick_started)
+
+        minutes_in_day = 1440
+        current_minutes = self.house.time_of_day * 60
+        new_minutes = current_minutes + (elapsed_sim_time)
+
+        if int(new_minutes / minutes_in_day) > int(self.last_day_time / minutes_in_day):
+            self.house.days_passed += 1
+            logger.info(f"New day started: Day {self.house.days_passed}")
+            self._on_day_change()
+            now = perf_counter()
+            metrics.observe("day_rollover", now - phase_started)
+            phase_started = now
+
+        self.last_day_time = new_minutes
+
+        new_minutes = new_minutes % minutes_in_day
+
+        self.house.time_of_day = new_minutes / 60
+        self.house.time_minutes = int(new_minutes)
+
+        previous_environment = dict(self.house.environment)
+        self._update_environment(elapsed_sim_time)
+        now = perf_counter()
+        metrics.observe("update_environment", now - phase_started)
+        phase_started = now
+
+        environment = self.house.environment
+        if self.integrator == "exponential":
+            # На длинном шаге улица меняется, поэтому берём среднее за шаг
+            environment = dict(environment)
+            for key in ["outside_temp", "outside_humidity"]:
+                environment[key] = (previous_environment[key] + environment[key]) / 2
+
+        if self.engine:
+            self.engine.step(environment, elapsed_sim_time)
+        else:
             for room_type, room in self.house.rooms.items():
-                self._update_room(room_type, room, elapsed_sim_time)
+                self._update_room(room_type, room, elapsed_sim_time, environment)
+        now = perf_counter()
+        metrics.observe("update_rooms", now - phase_started)
+        metrics.observe("tick", now - tick_started)
+
+        self.last_update = current_time
+        self.state_tracker.mark_changed()
+        self._publish_state(force=commands)
+
+        for listener in self.tick_listeners:
+            listener(self)
+
+    def save_checkpoint(self, path: str, extra: Optional[Dict] = None):
+        """Сохраняет состояние симулятора в сжатый файл контрольной точки.
+
+        Файл - архив NumPy (.npz) без объектов Python: массивы лога датчиков и
+        агрегатов и JSON с домом, состоянием генератора случайных чисел и extra
+        (extra должен сериализоваться в JSON)"""
+        with self._tick_lock:
+            sensor_log = self.sensor_log.to_arrays()
+            rollups_meta, rollups_arrays = self.rollups.to_state()
+            meta = {
+                "format": CHECKPOINT_FORMAT,
+                "house": self.get_house_state().model_dump(mode="json"),
+                "random_state": random.getstate(),
+                "weather_change_counter": self.weather_change_counter,
+                "last_day_time": self.last_day_time,
+                "last_motion_room": self.last_motion_room,
+                "sensor_log": {
+                    "room_names": self.sensor_log.room_names,
+                    "capacity": self.sensor_log.capacity,
+                },
+                "rollups": rollups_meta,
+                "extra": extra or {},
+            }
+            arrays = {
+                "meta": np.array(json.dumps(meta)),
+                "sensor_time": sensor_log["time"],
+                "sensor_values": sensor_log["values"],
+                **{f"rollups_{name}": a for name, a in rollups_arrays.items()},
+            }
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp_path, path)
+
+        logger.info(f"Checkpoint saved to {path}")
+
+    def load_checkpoint(self, path: str) -> Dict:
+        """Восстанавливает состояние симулятора из файла контрольной точки.
+        Файл читается без pickle; ValueError, если это не контрольная точка
+        текущего формата"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                arrays = {name: data[name] for name in data.files}
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            raise ValueError(f"Not a checkpoint file: {path}") from e
+        if meta.get("format") != CHECKPOINT_FORMAT:
+            raise ValueError(f"Unsupported checkpoint format: {meta.get('format')}")
+
+        version, internal_state, gauss_next = meta["random_state"]
+        meta["random_state"] = (version, tuple(internal_state), gauss_next)
+        log_meta = meta["sensor_log"]
+        meta["sensor_log"] = SensorLog.from_arrays(
+            log_meta["room_names"],
+            log_meta["capacity"],
+            arrays["sensor_time"],
+            arrays["sensor_values"],
+        )
+        meta["rollups"] = Rollups.from_state(
+            log_meta["room_names"],
+            meta["rollups"],
+            {
+                name[len("rollups_") :]: a
+                for name, a in arrays.items()
+                if name.startswith("rollups_")
+            },
+        )
+
+        state = self._submit(self._restore_checkpoint, meta).data
 
-            self.last_update = current_time
-            await asyncio.sleep(1.0 / self.house.simulation_speed)
+        logger.info(
+            f"Checkpoint loaded from {path}: day {state['days_passed']}, "
+            f"{state['time_minutes'] // 60:02d}:{state['time_minutes'] % 60:02d}"
+        )
+        return meta["extra"]
+
+    def _restore_checkpoint(self, state: Dict):
+        self._finish_report_file()
+        self.house = House.model_validate(state["house"])
+        random.setstate(state["random_state"])
+        self.weather_change_counter = state["weather_change_counter"]
+        self.last_day_time = state["last_day_time"]
+        self.last_motion_room = state["last_motion_room"]
+        self.sensor_log = state["sensor_log"]
+        self.rollups = state["rollups"]
+        self.devices.rebuild(self.house)
+        if self.engine:
+            self.engine = ArrayEngine(self.devices, self.integrator)
+        if self.history:
+            # Следующий тик запишет показания за текущую минуту заново
+            minute = self.absolute_minute()
+            self.history.truncate(minute, self.rollups.pending_starts(minute))
+        self.state_tracker.mark_changed()
+        # Снимок публикуется сразу, чтобы ответ на загрузку уже видел его
+        return self._publish_state(force=True)
 
     def _on_day_change(self):
         """Обработчик события смены дня"""
@@ -566,15 +959,24 @@ class SmartHomeSimulator:
 
     def stop_simulation(self):
         """Останавливает симуляцию"""
-        if any(len(self.sensor_data[room]["time"]) > 0 for room in self.sensor_data):
+        if len(self.sensor_log) > 0:
             self._generate_reports()
+        self.reports.shutdown()
+        if self.history:
+            self.history.flush()
         self.running = False
 
     def _update_environment(self, elapsed_time: float):
         """Обновляет внешние условия окружающей среды (время в минутах)"""
+        if self.weather_trace:
+            environment, weather = self.weather_trace.sample(self.absolute_minute())
+            self.house.environment.update(environment)
+            self.house.weather = weather
+            return
+
         self.weather_change_counter += elapsed_time
-        if self.weather_change_counter >= 60:
-            self.weather_change_counter = 0
+        while self.weather_change_counter >= 60:
+            self.weather_change_counter -= 60
             if random.random() < 0.1:
                 current_weather = self.house.weather
                 weather_options = [w for w in list(WeatherType) if w != current_weather]
@@ -603,7 +1005,8 @@ class SmartHomeSimulator:
         else:
             self.house.environment["outside_light"] = 5
 
-        base_humidity_change = random.uniform(-0.1, 0.1) * elapsed_time
+        # Случайное блуждание: разброс растёт как корень из длины шага
+        base_humidity_change = random.uniform(-0.1, 0.1) * math.sqrt(elapsed_time)
 
         if self.house.weather == WeatherType.RAINY:
             base_humidity_change += 0.2 * elapsed_time
@@ -613,32 +1016,84 @@ class SmartHomeSimulator:
             min(90, self.house.environment["outside_humidity"] + base_humidity_change),
         )
 
-    def _update_room(self, room_type: RoomType, room: Room, elapsed_time: float):
+    def _update_room(
+        self,
+        room_type: str,
+        room: Room,
+        elapsed_time: float,
+        environment: Optional[Dict] = None,
+    ):
         """Обновляет состояние комнаты и её устройств"""
-        self._update_temperature(room_type, room, elapsed_time)
+        if self.integrator == "exponential":
+            self._relax_room(
+                room_type, room, elapsed_time, environment or self.house.environment
+            )
+        else:
+            self._update_temperature(room_type, room, elapsed_time)
 
-        self._update_humidity(room_type, room, elapsed_time)
+            self._update_humidity(room_type, room, elapsed_time)
 
         self._update_light_level(room_type, room)
 
-    def _update_temperature(self, room_type: RoomType, room: Room, elapsed_time: float):
+    def _relax_room(
+        self, room_type: str, room: Room, elapsed_time: float, environment: Dict
+    ):
+        """Обновляет температуру и влажность точным экспоненциальным решением"""
+        devices = self.devices
+        window = devices.get(room_type, DeviceType.WINDOW)
+        window_open = window.status["open_percent"] / 100.0 if window else 0.0
+        ac = devices.get(room_type, DeviceType.AC)
+        climate = devices.get(room_type, DeviceType.CLIMATE)
+        temp_sensor = devices.get(room_type, DeviceType.TEMP_SENSOR)
+        humidity_sensor = devices.get(room_type, DeviceType.HUMIDITY_SENSOR)
+
+        if temp_sensor:
+            ac = ac.status if ac else OFF_STATUS
+            temp_sensor.status["temperature"] = float(
+                relax_temperature(
+                    temp_sensor.status["temperature"],
+                    environment["outside_temp"],
+                    window_open,
+                    ac["power"],
+                    ac["target_temp"],
+                    ac["intensity"] / 100.0,
+                    elapsed_time,
+                )
+            )
+        if humidity_sensor:
+            climate = climate.status if climate else OFF_STATUS
+            humidity_sensor.status["humidity"] = float(
+                relax_humidity(
+                    humidity_sensor.status["humidity"],
+                    environment["outside_humidity"],
+                    window_open,
+                    climate["power"],
+                    climate["target_humidity"],
+                    climate["intensity"] / 100.0,
+                    elapsed_time,
+                )
+            )
+
+    def _update_temperature(self, room_type: str, room: Room, elapsed_time: float):
         """Обновляет температуру в комнате (время в минутах)"""
-        temp_sensor_id = f"temp_sensor_{room_type.value}"
-        window_id = f"window_{room_type.value}"
-        ac_id = f"ac_{room_type.value}"
+        temp_sensor = self.devices.get(room_type, DeviceType.TEMP_SENSOR)
+        if not temp_sensor:
+            return
+        window = self.devices.get(room_type, DeviceType.WINDOW)
+        ac = self.devices.get(room_type, DeviceType.AC)
+        ac_status = ac.status if ac else OFF_STATUS
 
-        current_temp = room.devices[temp_sensor_id].status["temperature"]
+        current_temp = temp_sensor.status["temperature"]
 
         outside_temp = self.house.environment["outside_temp"]
 
         window_factor = 0
-        if window_id in room.devices:
-            window_percent = room.devices[window_id].status["open_percent"]
+        if window:
+            window_percent = window.status["open_percent"]
             window_factor = window_percent / 100.0
 
         ac_factor = 0
-        if room.devices[ac_id].status["power"]:
-            ac_status = room.devices[ac_id].status
+        if ac_status["power"]:
             ac_intensity = ac_status["intensity"] / 100.0
             ac_target = ac_status["target_temp"]
             ac_diff = abs(current_temp - ac_target)
@@ -659,25 +1114,27 @@ class SmartHomeSimulator:
         else:
             new_temp += diff
 
-        room.devices[temp_sensor_id].status["temperature"] = new_temp
+        temp_sensor.status["temperature"] = new_temp
 
-    def _update_humidity(self, room_type: RoomType, room: Room, elapsed_time: float):
+    def _update_humidity(self, room_type: str, room: Room, elapsed_time: float):
         """Обновляет влажность в комнате (время в минутах)"""
-        humidity_sensor_id = f"humidity_sensor_{room_type.value}"
-        window_id = f"window_{room_type.value}"
-        climate_id = f"climate_{room_type.value}"
-
-        current_humidity = room.devices[humidity_sensor_id].status["humidity"]
+        humidity_sensor = self.devices.get(room_type, DeviceType.HUMIDITY_SENSOR)
+        if not humidity_sensor:
+            return
+        window = self.devices.get(room_type, DeviceType.WINDOW)
+        climate = self.devices.get(room_type, DeviceType.CLIMATE)
+        climate_status = climate.status if climate else OFF_STATUS
+
+        current_humidity = humidity_sensor.status["humidity"]
         outside_humidity = self.house.environment["outside_humidity"]
 
         window_factor = 0
-        if window_id in room.devices:
-            window_percent = room.devices[window_id].status["open_percent"]
+        if window:
+            window_percent = window.status["open_percent"]
             window_factor = window_percent / 100.0
 
         climate_factor = 0
-        if room.devices[climate_id].status["power"]:
-            climate_status = room.devices[climate_id].status
+        if climate_status["power"]:
             climate_intensity = climate_status["intensity"] / 100.0
             climate_target = climate_status["target_humidity"]
             climate_diff = abs(current_humidity - climate_target)
@@ -698,26 +1155,26 @@ class SmartHomeSimulator:
         else:
             new_humidity += diff
 
-        room.devices[humidity_sensor_id].status["humidity"] = max(
-            10, min(99, new_humidity)
-        )
+        humidity_sensor.status["humidity"] = max(10, min(99, new_humidity))
 
-    def _update_light_level(self, room_type: RoomType, room: Room):
+    def _update_light_level(self, room_type: str, room: Room):
         """Обновляет уровень освещенности в комнате"""
-        light_sensor_id = f"light_sensor_{room_type.value}"
-        light_id = f"light_{room_type.value}"
-        curtain_id = f"curtain_{room_type.value}"
-        window_id = f"window_{room_type.value}"
+        light_sensor = self.devices.get(room_type, DeviceType.LIGHT_SENSOR)
+        if not light_sensor:
+            return
+        light = self.devices.get(room_type, DeviceType.LIGHT)
+        curtain = self.devices.get(room_type, DeviceType.CURTAIN)
+        window = self.devices.get(room_type, DeviceType.WINDOW)
 
         outside_light = self.house.environment["outside_light"]
 
-        internal_light = room.devices[light_id].status["brightness"]
+        internal_light = light.status["brightness"] if light else 0
 
         external_light = 0
-        if curtain_id in room.devices and window_id in room.devices:
-            curtain_open = room.devices[curtain_id].status["open_percent"] / 100.0
-            window_open = room.devices[window_id].status["open_percent"] / 100.0
+        if curtain and window:
+            curtain_open = curtain.status["open_percent"] / 100.0
+            window_open = window.status["open_percent"] / 100.0
             external_light = outside_light * curtain_open * (1 + window_open) / 2
 
         total_light = min(100, internal_light + external_light)
-        room.devices[light_sensor_id].status["light_level"] = round(total_light, 1)
+        light_sensor.status["light_level"] = round(total_light, 1)
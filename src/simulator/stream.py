@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional, Set
+from .versioning import StateSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class StateBroadcaster:
+    """Рассылка состояния дома подписчикам потока (Server-Sent Events).
+
+    Подключается к симулятору как обработчик публикации снимка. Пока есть
+    подписчики, не чаще раза в min_interval секунд рассылается последний
+    опубликованный снимок состояния - после тика или команды, изменившей дом:
+    готовый кадр SSE кладётся в очередь каждого подписчика. Очередь
+    хранит только последний кадр, так что медленный клиент пропускает
+    промежуточные состояния, а не копит их.
+    """
+
+    def __init__(self, min_interval: float = 0.1):
+        self.min_interval = min_interval
+        self.frames_sent = 0
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_publish = 0.0
+        self._last_version = None
+        self._latest: Optional[StateSnapshot] = None
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Регистрирует подписчика (вызывается из цикла событий сервера)"""
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        logger.info(f"State stream subscriber added ({len(self._subscribers)} total)")
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+        logger.info(f"State stream subscriber removed ({len(self._subscribers)} total)")
+
+    @staticmethod
+    def encode(snapshot: StateSnapshot) -> bytes:
+        """Кадр SSE со снимком состояния дома"""
+        return b"event: state\ndata: " + snapshot.body + b"\n\n"
+
+    def on_snapshot(self, snapshot: StateSnapshot):
+        """Обработчик публикации снимка (после тика или команды): рассылает
+        его подписчикам. Снимок, пришедший раньше min_interval после прошлой
+        рассылки, отправляется отложенно, чтобы изменение между редкими тиками
+        не ждало следующего тика"""
+        loop = self._loop
+        if not self._subscribers or loop is None:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if snapshot.version == self._last_version:
+                return
+            self._latest = snapshot
+            wait = self._last_publish + self.min_interval - now
+            if wait > 0:
+                if not self._scheduled:
+                    self._scheduled = True
+                    # Снимки публикуются и в цикле событий, и в потоке
+                    # ускоренной прокрутки
+                    loop.call_soon_threadsafe(loop.call_later, wait, self._send_latest)
+                return
+            self._mark_sent(snapshot, now)
+
+        loop.call_soon_threadsafe(self._deliver, self.encode(snapshot))
+
+    def _mark_sent(self, snapshot: StateSnapshot, now: float):
+        self._last_publish = now
+        self._last_version = snapshot.version
+        self.frames_sent += 1
+
+    def _send_latest(self):
+        """Отложенная рассылка последнего снимка (в цикле событий)"""
+        with self._lock:
+            self._scheduled = False
+            snapshot = self._latest
+            if snapshot is None or snapshot.version == self._last_version:
+                return
+            self._mark_sent(snapshot, time.monotonic())
+        self._deliver(self.encode(snapshot))
+
+    def _deliver(self, frame: bytes):
+        for queue in list(self._subscribers):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(frame)
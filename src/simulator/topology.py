@@ -0,0 +1,88 @@
+import copy
+import json
+import logging
+from typing import Dict, Set
+from .models import DeviceStatus, DeviceType, Room
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATUS = {
+    DeviceType.LIGHT: {"brightness": 0},
+    DeviceType.CURTAIN: {"open_percent": 0},
+    DeviceType.WINDOW: {"open_percent": 0},
+    DeviceType.AC: {"power": False, "target_temp": 22, "intensity": 10},
+    DeviceType.CLIMATE: {"power": False, "target_humidity": 50, "intensity": 10},
+    DeviceType.TEMP_SENSOR: {"temperature": 22.0},
+    DeviceType.HUMIDITY_SENSOR: {"humidity": 50.0},
+    DeviceType.LIGHT_SENSOR: {"light_level": 50.0},
+    DeviceType.MOTION_SENSOR: {"detected": False},
+}
+
+
+def _create_devices(
+    room_name: str, device_configs, device_ids: Set[str]
+) -> Dict[str, DeviceStatus]:
+    """Создаёт устройства комнаты по описанию из конфигурации. device_ids -
+    id устройств, уже созданных в других комнатах"""
+    devices = {}
+    device_types = set()
+    for device_config in device_configs:
+        if isinstance(device_config, str):
+            device_config = {"type": device_config}
+
+        device_type = DeviceType(device_config["type"])
+        # Физика комнаты учитывает одно устройство каждого типа
+        if device_type in device_types:
+            raise ValueError(
+                f"Room {room_name} has more than one {device_type.value} device"
+            )
+        device_types.add(device_type)
+
+        device_id = device_config.get("id", f"{device_type.value}_{room_name}")
+        if device_id in device_ids:
+            raise ValueError(f"Duplicate device id in topology: {device_id}")
+        device_ids.add(device_id)
+
+        status = copy.deepcopy(DEFAULT_STATUS[device_type])
+        status.update(device_config.get("status", {}))
+
+        devices[device_id] = DeviceStatus(id=device_id, type=device_type, status=status)
+    return devices
+
+
+def load_topology(path: str) -> Dict[str, Room]:
+    """Загружает комнаты дома из JSON-файла конфигурации.
+
+    Формат: {"rooms": [{"name": ..., "type": ..., "count": N, "devices": [...]}]}.
+    Устройство задаётся типом или объектом {"type", "id", "status"}. Если у
+    комнаты есть count, она размножается, а {i} в имени заменяется на номер.
+    В комнате может быть не больше одного устройства каждого типа, id
+    устройств должны быть уникальны во всём доме.
+    """
+    with open(path) as f:
+        config = json.load(f)
+
+    rooms = {}
+    device_ids: Set[str] = set()
+    for room_config in config["rooms"]:
+        count = room_config.get("count")
+        names = (
+            [room_config["name"].format(i=i) for i in range(count)]
+            if count is not None
+            else [room_config["name"]]
+        )
+        for name in names:
+            if name in rooms:
+                raise ValueError(f"Duplicate room name in topology: {name}")
+            rooms[name] = Room(
+                type=room_config.get("type", name),
+                devices=_create_devices(
+                    name, room_config.get("devices", []), device_ids
+                ),
+            )
+
+    logger.info(
+        f"Loaded topology {path}: {len(rooms)} rooms, "
+        f"{sum(len(r.devices) for r in rooms.values())} devices"
+    )
+    return rooms
@@ -0,0 +1,104 @@
+import argparse
+import json
+import logging
+import os
+import numpy as np
+import pandas as pd
+from .models import WeatherType
+
+logger = logging.getLogger(__name__)
+
+WEATHERS = list(WeatherType)
+COLUMNS = {
+    "outside_temp": "<f4",
+    "outside_humidity": "<f4",
+    "outside_light": "<f4",
+    "weather": "i1",
+}
+
+
+class WeatherTrace:
+    """Записанная трасса погоды: каталог со столбцами .npy, открываемыми через
+    memory-map, так что многомесячные трассы не загружаются в память целиком и
+    разделяются между процессами через страничный кэш ОС"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.step_minutes = meta.get("step_minutes", 1)
+        self.columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in COLUMNS
+        }
+        self.length = len(self.columns["weather"])
+        logger.info(
+            f"Weather trace {path} opened: {self.length} samples "
+            f"every {self.step_minutes} minutes"
+        )
+
+    def index(self, minute):
+        """Индекс записи для абсолютной минуты симуляции (трасса зациклена)"""
+        return (np.asarray(minute) // self.step_minutes).astype(np.int64) % self.length
+
+    def sample(self, minute: int):
+        """Возвращает внешние условия и погоду для абсолютной минуты симуляции"""
+        i = int(self.index(minute))
+        environment = {
+            "outside_temp": float(self.columns["outside_temp"][i]),
+            "outside_humidity": float(self.columns["outside_humidity"][i]),
+            "outside_light": float(self.columns["outside_light"][i]),
+        }
+        return environment, WEATHERS[self.columns["weather"][i]]
+
+    @staticmethod
+    def write(
+        path: str,
+        outside_temp,
+        outside_humidity,
+        outside_light,
+        weather,
+        step_minutes: int = 1,
+    ):
+        """Сохраняет трассу погоды в каталог столбцов .npy"""
+        os.makedirs(path, exist_ok=True)
+        weather_codes = [
+            WEATHERS.index(WeatherType(w)) if isinstance(w, str) else w for w in weather
+        ]
+        values = {
+            "outside_temp": outside_temp,
+            "outside_humidity": outside_humidity,
+            "outside_light": outside_light,
+            "weather": weather_codes,
+        }
+        for name, dtype in COLUMNS.items():
+            np.save(os.path.join(path, f"{name}.npy"), np.asarray(values[name], dtype))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"step_minutes": step_minutes, "length": len(weather)}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a weather CSV into a memory-mappable trace"
+    )
+    parser.add_argument(
+        "csv", help="CSV with outside_temp, outside_humidity, outside_light, weather"
+    )
+    parser.add_argument("output", help="Trace directory to create")
+    parser.add_argument("--step-minutes", type=int, default=1)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    WeatherTrace.write(
+        args.output,
+        df["outside_temp"].values,
+        df["outside_humidity"].values,
+        df["outside_light"].values,
+        df["weather"].values,
+        args.step_minutes,
+    )
+    logger.info(f"Weather trace with {len(df)} samples saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+from .models import House
+
+# Поля верхнего уровня, которые меняются почти каждый тик и всегда входят в дельту
+SCALAR_FIELDS = (
+    "time_of_day",
+    "time_minutes",
+    "simulation_speed",
+    "weather",
+    "days_passed",
+)
+
+
+class StateSnapshot(NamedTuple):
+    """Состояние дома на одной версии, сериализованное один раз. Общее для всех
+    читателей до следующего изменения; data изменять нельзя"""
+
+    version: int
+    etag: str
+    data: Dict
+    body: bytes
+
+
+class StateTracker:
+    """Версия состояния дома и учёт изменённых устройств.
+
+    Симулятор помечает состояние изменённым (mark_changed) после тика и любой
+    команды, а публикует его (publish) из цикла тиков, пока дом не меняется:
+    дом сравнивается с копией на прошлой версии, и если что-то изменилось,
+    версия увеличивается, запоминается для каждого изменившегося устройства и
+    поля окружения, а состояние один раз сериализуется в StateSnapshot.
+    Читатели получают только опубликованные снимки и сам дом не трогают.
+    epoch отличает версии разных запусков сервера.
+    """
+
+    def __init__(self):
+        self.epoch = f"{time.time_ns():x}"
+        self.version = 0
+        # Дельта от версий раньше этой невозможна (сменился набор устройств)
+        self._base_version = 0
+        self._pending = True
+        self._lock = threading.Lock()
+        self._devices: Dict[Tuple[str, str], Dict] = {}
+        self._device_versions: Dict[Tuple[str, str], int] = {}
+        self._environment: Dict[str, float] = {}
+        self._environment_versions: Dict[str, int] = {}
+        self._scalars: Optional[Tuple] = None
+        self._snapshot: Optional[StateSnapshot] = None
+
+    @property
+    def current(self) -> Optional[StateSnapshot]:
+        """Последний опубликованный снимок"""
+        return self._snapshot
+
+    def mark_changed(self):
+        self._pending = True
+
+    def _commit(self, house: House) -> int:
+        """Фиксирует изменения дома с прошлой версии, возвращает текущую версию"""
+        if not self._pending:
+            return self.version
+        self._pending = False
+
+        version = self.version + 1
+        changed = False
+
+        keys = set()
+        added = False
+        for room_name, room in house.rooms.items():
+            for device_id, device in room.devices.items():
+                key = (room_name, device_id)
+                keys.add(key)
+                previous = self._devices.get(key)
+                if previous != device.status:
+                    added = added or previous is None
+                    self._devices[key] = dict(device.status)
+                    self._device_versions[key] = version
+                    changed = True
+        removed = self._devices.keys() - keys
+        for key in removed:
+            del self._devices[key]
+            del self._device_versions[key]
+        if added or removed:
+            self._base_version = version
+            changed = True
+
+        for name, value in house.environment.items():
+            if self._environment.get(name) != value:
+                self._environment[name] = value
+                self._environment_versions[name] = version
+                changed = True
+
+        scalars = tuple(getattr(house, name) for name in SCALAR_FIELDS)
+        if scalars != self._scalars:
+            self._scalars = scalars
+            changed = True
+
+        if changed:
+            self.version = version
+        return self.version
+
+    def etag(self, version: Optional[int] = None) -> str:
+        """ETag версии состояния (по умолчанию текущей)"""
+        return f'"{self.epoch}-{self.version if version is None else version}"'
+
+    def publish(self, house: House) -> StateSnapshot:
+        """Фиксирует изменения и публикует снимок новой версии. Вызывается
+        только тем, кто изменяет дом (цикл тиков), пока дом не меняется"""
+        with self._lock:
+            version = self._commit(house)
+            if self._snapshot is None or self._snapshot.version != version:
+                body = house.model_dump_json().encode()
+                self._snapshot = StateSnapshot(
+                    version, self.etag(version), json.loads(body), body
+                )
+            return self._snapshot
+
+    def delta(self, since: int) -> Dict:
+        """Изменения дома после версии since в виде частичного House: только
+        изменившиеся устройства и поля окружения из последнего снимка. Если
+        дельту построить нельзя (версия из будущего или до смены набора
+        устройств), возвращается всё состояние с full=True"""
+        with self._lock:
+            snapshot = self._snapshot
+            data = snapshot.data
+            header = {"version": snapshot.version, "epoch": self.epoch, "since": since}
+            if since < self._base_version or since > snapshot.version:
+                return {**header, "full": True, **data}
+
+            rooms: Dict[str, Dict] = {}
+            for (room_name, device_id), device_version in self._device_versions.items():
+                if device_version > since:
+                    devices = rooms.setdefault(room_name, {"devices": {}})["devices"]
+                    devices[device_id] = data["rooms"][room_name]["devices"][device_id]
+            environment = {
+                name: data["environment"][name]
+                for name, field_version in self._environment_versions.items()
+                if field_version > since
+            }
+
+        return {
+            **header,
+            "full": False,
+            **{name: data[name] for name in SCALAR_FIELDS},
+            "rooms": rooms,
+            "environment": environment,
+        }
@@ -0,0 +1,155 @@
+import argparse
+import itertools
+import json
+import logging
+import random
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from simulator.models import DeviceType, RoomType, WeatherType
+from simulator.simulator import SmartHomeSimulator
+from virtual_user.virtual_user import VirtualUser
+
+logger = logging.getLogger("Sweep")
+
+
+class Scenario(BaseModel):
+    name: str
+    days: float = 1
+    seed: Optional[int] = None
+    weather: List[WeatherType] = []
+    initial_temperature: Dict[RoomType, float] = {}
+    initial_humidity: Dict[RoomType, float] = {}
+    bathroom_ac: Dict = {}
+    schedule: Optional[Dict[str, int]] = None
+    vectorized: bool = False
+    integrator: str = "euler"
+    step_minutes: float = 1
+    weather_trace: Optional[str] = None
+    topology: Optional[str] = None
+
+
+class _CollectingSimulator(SmartHomeSimulator):
+    """Симулятор для прогонов: вместо отчётов на диск копит дневные логи в памяти"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.collected_days = []
+
+    def _stream_reports(self):
+        pass
+
+    def _generate_reports(self):
+        self.collected_days.append((self.house.days_passed - 1, self.sensor_log.copy()))
+        self.sensor_log.clear()
+        self.rollups.flush()
+        self.rollups.take()
+
+
+def expand_grid(base: Dict, grid: Dict[str, List]) -> List[Scenario]:
+    """Строит декартово произведение параметров сетки поверх базового сценария"""
+    keys = list(grid.keys())
+    prefix = base.get("name", "scenario")
+    scenarios = []
+    for i, values in enumerate(itertools.product(*(grid[k] for k in keys))):
+        params = {**base, "name": f"{prefix}_{i}", **dict(zip(keys, values))}
+        scenarios.append(Scenario(**params))
+    return scenarios
+
+
+def run_scenario(scenario: Scenario) -> pd.DataFrame:
+    """Прогоняет один сценарий и возвращает логи датчиков в столбцовом виде"""
+    random.seed(scenario.seed)
+    simulator = _CollectingSimulator(
+        vectorized=scenario.vectorized,
+        integrator=scenario.integrator,
+        step_minutes=scenario.step_minutes,
+        weather_trace=scenario.weather_trace,
+        topology=scenario.topology,
+    )
+
+    devices = simulator.devices
+    for room_type, value in scenario.initial_temperature.items():
+        devices.get(room_type, DeviceType.TEMP_SENSOR).status["temperature"] = value
+    for room_type, value in scenario.initial_humidity.items():
+        devices.get(room_type, DeviceType.HUMIDITY_SENSOR).status["humidity"] = value
+    if simulator.engine:
+        simulator.engine.load_sensors()
+
+    if scenario.bathroom_ac:
+        simulator.update_device(
+            RoomType.BATHROOM,
+            devices.device_id(RoomType.BATHROOM, DeviceType.AC),
+            scenario.bathroom_ac,
+        )
+
+    user = None
+    if scenario.schedule is not None:
+        user = VirtualUser()
+        user.simulator = simulator
+        user.schedule = {**user.schedule, **scenario.schedule}
+
+    ticks = int(scenario.days * 1440 / simulator.step_minutes)
+    for tick in range(ticks):
+        if scenario.weather:
+            hour = int(tick * simulator.step_minutes // 60)
+            simulator.set_weather(scenario.weather[hour % len(scenario.weather)])
+        if user:
+            user._update_user_state(int(simulator.house.time_of_day))
+        simulator._tick(simulator.step_minutes)
+
+    if len(simulator.sensor_log):
+        simulator.collected_days.append(
+            (simulator.house.days_passed, simulator.sensor_log)
+        )
+
+    frames = []
+    for day, sensor_log in simulator.collected_days:
+        for room_name, room_data in sensor_log.items():
+            df = pd.DataFrame(room_data).rename(columns={"time": "time_minutes"})
+            df.insert(0, "room", room_name)
+            df.insert(0, "day", day)
+            frames.append(df)
+
+    result = pd.concat(frames, ignore_index=True)
+    result.insert(0, "scenario", scenario.name)
+    return result
+
+
+def run_sweep(
+    scenarios: List[Scenario], processes: Optional[int] = None
+) -> pd.DataFrame:
+    """Распределяет сценарии по процессам и собирает общий столбцовый результат"""
+    started = time.time()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = list(executor.map(run_scenario, scenarios))
+
+    logger.info(
+        f"Sweep of {len(scenarios)} scenarios finished in {time.time() - started:.2f}s"
+    )
+    return pd.concat(results, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a grid of simulation scenarios")
+    parser.add_argument(
+        "config",
+        help='JSON file of the form {"base": {...}, "grid": {"param": [values]}}',
+    )
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+
+    scenarios = expand_grid(config.get("base", {}), config.get("grid", {}))
+    result = run_sweep(scenarios, args.processes)
+    result.to_csv(args.output, index=False)
+    logger.info(f"Sweep results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
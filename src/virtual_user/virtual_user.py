@@ -5,6 +5,7 @@ import ollama
 from datetime import datetime
 from enum import Enum
 import logging
+from simulator.models import DeviceType
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -105,6 +106,27 @@ Keep your answer short and focused on device adjustments or your comfort level o
         """Остановка виртуального пользователя"""
         self.is_active = False
 
+    def get_state(self):
+        """Состояние пользователя для сохранения в контрольную точку"""
+        return {
+            "state": self.state.value,
+            "current_room": self.current_room,
+            "last_action_time": self.last_action_time,
+            "last_query_time": self.last_query_time,
+            "comfort_status": self.comfort_status,
+        }
+
+    def load_state(self, state):
+        """Восстановление состояния пользователя из контрольной точки"""
+        self.state = UserState(state["state"])
+        self.current_room = state["current_room"]
+        self.last_action_time = state["last_action_time"]
+        self.last_query_time = state["last_query_time"]
+        self.comfort_status = state["comfort_status"]
+        logger.info(
+            f"Virtual user state restored: {self.state.value} in {self.current_room}"
+        )
+
     def get_status(self):
         """Получение текущего статуса пользователя"""
         return {
@@ -119,16 +141,22 @@ Keep your answer short and focused on device adjustments or your comfort level o
         await self._apply_user_preferences(self.comfort_status, house_state)
 
     def _get_house_state(self):
-        """Получение текущего состояния дома через API"""
-        return self.simulator.get_house_state().model_dump()
-
-    def _update_device(self, room, device_id, status):
-        """Обновление состояния устройства через API"""
+        """Получение текущего состояния дома через API (общий снимок, только чтение)"""
+        return self.simulator.state_snapshot().data
+
+    def _queue_device_of_type(self, updates, room, device_type, status):
+        """Добавление в пакет обновления устройства заданного типа, если оно есть
+        в комнате"""
+        device_id = self.simulator.devices.device_id(room, device_type)
+        if device_id is not None:
+            updates.append((room, device_id, status))
+
+    def _update_devices(self, updates):
+        """Пакетное обновление устройств через API (целиком между тиками)"""
         try:
-            success = self.simulator.update_device(room, device_id, status)
-            return success
+            return self.simulator.update_devices(updates)
         except Exception as e:
-            logger.error(f"Failed to update device: {e}")
+            logger.error(f"Failed to update devices: {e}")
             return None
 
     def _update_user_state(self, current_hour):
@@ -168,24 +196,27 @@ Keep your answer short and focused on device adjustments or your comfort level o
         if self.state != UserState.HOME:
             return
 
-        rooms = ["living_room", "kitchen", "bathroom", "bedroom"]
+        rooms = list(self.simulator.house.rooms.keys())
         possible_rooms = [r for r in rooms if r != self.current_room]
 
         if random.random() < 0.4:
             new_room = random.choice(possible_rooms)
             logger.info(f"User is moving from {self.current_room} to {new_room}")
 
-            self._update_device(
+            updates = []
+            self._queue_device_of_type(
+                updates,
                 self.current_room,
-                f"motion_sensor_{self.current_room}",
+                DeviceType.MOTION_SENSOR,
                 {"detected": False},
             )
 
             self.current_room = new_room
 
-            self._update_device(
-                new_room, f"motion_sensor_{new_room}", {"detected": True}
+            self._queue_device_of_type(
+                updates, new_room, DeviceType.MOTION_SENSOR, {"detected": True}
             )
+            self._update_devices(updates)
 
             await self._on_room_changing(house_state)
 
@@ -202,7 +233,7 @@ Keep your answer short and focused on device adjustments or your comfort level o
         sensors_info = []
 
         for device_id, device in room_data.get("devices", {}).items():
-            if "sensor" in device_id:
+            if self.simulator.devices.is_sensor(device_id):
                 sensor_status = self._format_status_for_prompt(device)
                 sensors_info.append(f"- {device_id}: {sensor_status}")
             else:
@@ -237,58 +268,95 @@ Keep your answer short and focused on device adjustments or your comfort level o
             return "I'm having trouble deciding what I need."
 
     def _perform_routine_actions(self, state_change=None):
-        """Выполнение рутинных действий при изменении состояния"""
+        """Выполнение рутинных действий при изменении состояния. Обновления
+        устройств применяются одним пакетом, чтобы рутина не разрывалась тиком"""
+        updates = []
         if state_change == "wake_up":
-            self._update_device("bedroom", "light_bedroom", {"brightness": 60})
-            self._update_device("bedroom", "curtain_bedroom", {"open_percent": 70})
-            self._update_device("bedroom", "motion_sensor_bedroom", {"detected": False})
-            self._update_device("kitchen", "motion_sensor_kitchen", {"detected": True})
+            self._queue_device_of_type(
+                updates, "bedroom", DeviceType.LIGHT, {"brightness": 60}
+            )
+            self._queue_device_of_type(
+                updates, "bedroom", DeviceType.CURTAIN, {"open_percent": 70}
+            )
+            self._queue_device_of_type(
+                updates, "bedroom", DeviceType.MOTION_SENSOR, {"detected": False}
+            )
+            self._queue_device_of_type(
+                updates, "kitchen", DeviceType.MOTION_SENSOR, {"detected": True}
+            )
             self.current_room = "kitchen"
-            self._update_device("kitchen", "light_kitchen", {"brightness": 80})
+            self._queue_device_of_type(
+                updates, "kitchen", DeviceType.LIGHT, {"brightness": 80}
+            )
             logger.info("Performed wake up routine")
 
         elif state_change == "leave_home":
-            for room in ["living_room", "kitchen", "bathroom", "bedroom"]:
-                self._update_device(room, f"motion_sensor_{room}", {"detected": False})
+            rooms = list(self.simulator.house.rooms.keys())
+            for room in rooms:
+                self._queue_device_of_type(
+                    updates, room, DeviceType.MOTION_SENSOR, {"detected": False}
+                )
 
-            for room in ["living_room", "kitchen", "bathroom", "bedroom"]:
-                self._update_device(room, f"light_{room}", {"brightness": 0})
-                if room != "bathroom":  # В ванной нет окна
-                    self._update_device(room, f"window_{room}", {"open_percent": 0})
-                    self._update_device(room, f"curtain_{room}", {"open_percent": 0})
+            for room in rooms:
+                self._queue_device_of_type(
+                    updates, room, DeviceType.LIGHT, {"brightness": 0}
+                )
+                # В ванной нет окна и занавесок, такие устройства пропускаются
+                self._queue_device_of_type(
+                    updates, room, DeviceType.WINDOW, {"open_percent": 0}
+                )
+                self._queue_device_of_type(
+                    updates, room, DeviceType.CURTAIN, {"open_percent": 0}
+                )
 
             logger.info("Performed leave home routine")
 
         elif state_change == "return_home":
-            self._update_device(
-                "living_room", "motion_sensor_living_room", {"detected": True}
+            self._queue_device_of_type(
+                updates, "living_room", DeviceType.MOTION_SENSOR, {"detected": True}
             )
 
             current_hour = datetime.now().hour
             brightness = 80 if current_hour < 20 else 50
-            self._update_device(
-                "living_room", "light_living_room", {"brightness": brightness}
+            self._queue_device_of_type(
+                updates, "living_room", DeviceType.LIGHT, {"brightness": brightness}
             )
 
             logger.info("Performed return home routine")
 
         elif state_change == "go_to_bed":
-            for room in ["living_room", "kitchen", "bathroom"]:
-                self._update_device(room, f"light_{room}", {"brightness": 0})
-                self._update_device(room, f"motion_sensor_{room}", {"detected": False})
+            for room in self.simulator.house.rooms:
+                if room == "bedroom":
+                    continue
+                self._queue_device_of_type(
+                    updates, room, DeviceType.LIGHT, {"brightness": 0}
+                )
+                self._queue_device_of_type(
+                    updates, room, DeviceType.MOTION_SENSOR, {"detected": False}
+                )
 
-            self._update_device("bedroom", "motion_sensor_bedroom", {"detected": True})
-            self._update_device("bedroom", "light_bedroom", {"brightness": 20})
-            self._update_device("bedroom", "curtain_bedroom", {"open_percent": 0})
+            self._queue_device_of_type(
+                updates, "bedroom", DeviceType.MOTION_SENSOR, {"detected": True}
+            )
+            self._queue_device_of_type(
+                updates, "bedroom", DeviceType.LIGHT, {"brightness": 20}
+            )
+            self._queue_device_of_type(
+                updates, "bedroom", DeviceType.CURTAIN, {"open_percent": 0}
+            )
 
-            self._update_device(
+            self._queue_device_of_type(
+                updates,
                 "bedroom",
-                "ac_bedroom",
+                DeviceType.AC,
                 {"power": True, "mode": "cooling", "intensity": 40},
             )
 
             logger.info("Performed go to bed routine")
 
+        if updates:
+            self._update_devices(updates)
+
     def _format_status_for_prompt(self, device):
         """Форматирование статуса устройства для промпта с проверкой безопасности"""
         try:
@@ -385,13 +453,16 @@ Keep your answer short and focused on device adjustments or your comfort level o
 
                 logger.info(f"Parsed actions: {actions}")
 
+                updates = []
                 for action in actions:
                     device_id = action.get("device")
                     status = action.get("status")
 
                     if device_id and status:
                         logger.info(f"Updating device {device_id} with status {status}")
-                        self._update_device(self.current_room, device_id, status)
+                        updates.append((self.current_room, device_id, status))
+                if updates:
+                    self._update_devices(updates)
 
             except json.JSONDecodeError:
                 logger.error(f"Failed to parse actions JSON: {json_str}")